@@ -0,0 +1,333 @@
+# app/embeddings.py
+"""
+Embedding backends, selected by EMBEDDINGS_BACKEND and loaded lazily on first use.
+
+  minilm   sentence-transformers MiniLM (default)
+  onnx     the same model exported to ONNX (int8-quantized file preferred), run with onnxruntime
+  hashing  deterministic hashed word / char-trigram vectors; needs no model files
+  none     no embeddings (lexical scoring only; also AI_EMBEDDINGS=off)
+
+Models are only read from EMBEDDINGS_MODEL_PATH on local disk, never downloaded.
+Every backend returns L2-normalized float32 rows and keeps throughput counters.
+`embed` memoizes vectors per (backend, whitespace-normalized text) in a bounded
+LRU, optionally backed by a sqlite file (EMBEDDINGS_CACHE_DB) shared by workers.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+log = logging.getLogger(__name__)
+
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "minilm").lower()
+EMBEDDINGS_MODEL_PATH = os.getenv("EMBEDDINGS_MODEL_PATH", "models/all-MiniLM-L6-v2")
+EMBEDDINGS_BATCH_SIZE = int(os.getenv("EMBEDDINGS_BATCH_SIZE", "64"))
+EMBEDDINGS_DIM = int(os.getenv("EMBEDDINGS_DIM", "384"))  # hashing backend only
+EMBEDDINGS_MAX_TOKENS = int(os.getenv("EMBEDDINGS_MAX_TOKENS", "256"))  # onnx backend only
+EMBEDDINGS_CACHE_SIZE = int(os.getenv("EMBEDDINGS_CACHE_SIZE", "20000"))  # vectors kept in memory; 0 disables
+EMBEDDINGS_CACHE_DB = os.getenv("EMBEDDINGS_CACHE_DB", "")  # optional sqlite file shared by workers
+
+class EmbeddingBackend:
+    """Base class: subclasses implement `_encode`; `encode` adds timing counters."""
+    name = "base"
+
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _encode(self, texts: List[str]):
+        raise NotImplementedError
+
+    def encode(self, texts: List[str]):
+        start = time.perf_counter()
+        out = self._encode(texts)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+            self.seconds += elapsed
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "calls": self.calls,
+            "texts": self.texts,
+            "seconds": round(self.seconds, 3),
+            "texts_per_sec": round(self.texts / self.seconds, 1) if self.seconds else None,
+        }
+
+def _require_local(path: str) -> str:
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"Embedding model not found at {path!r} (set EMBEDDINGS_MODEL_PATH)")
+    return path
+
+class MiniLMBackend(EmbeddingBackend):
+    def __init__(self, path: str):
+        super().__init__()
+        from sentence_transformers import SentenceTransformer  # type: ignore
+        self.model = SentenceTransformer(_require_local(path), device="cpu")
+        # same id as the hub model, so vectors stored before the switch to local paths stay valid
+        self.name = f"sentence-transformers/{os.path.basename(os.path.normpath(path))}"
+
+    def _encode(self, texts: List[str]):
+        return self.model.encode(texts, batch_size=EMBEDDINGS_BATCH_SIZE, normalize_embeddings=True)
+
+class OnnxBackend(EmbeddingBackend):
+    """Mean-pooled transformer outputs from an ONNX export (e.g. model_quantized.onnx + tokenizer.json)."""
+    FILES = ("model_quantized.onnx", "onnx/model_quantized.onnx", "model.onnx", "onnx/model.onnx")
+
+    def __init__(self, path: str):
+        super().__init__()
+        import onnxruntime as ort  # type: ignore
+        from tokenizers import Tokenizer  # type: ignore
+        path = _require_local(path)
+        model_file = next((os.path.join(path, f) for f in self.FILES if os.path.isfile(os.path.join(path, f))), None)
+        if model_file is None:
+            raise FileNotFoundError(f"No ONNX model in {path!r}")
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = int(os.getenv("EMBEDDINGS_THREADS", "0"))
+        self.session = ort.InferenceSession(model_file, opts, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=EMBEDDINGS_MAX_TOKENS)
+        self.tokenizer.enable_padding()
+        quantized = "quantized" in os.path.basename(model_file)
+        self.name = f"onnx{'-int8' if quantized else ''}/{os.path.basename(os.path.normpath(path))}"
+
+    def _encode(self, texts: List[str]):
+        import numpy as np  # type: ignore
+        out = []
+        for i in range(0, len(texts), EMBEDDINGS_BATCH_SIZE):
+            enc = self.tokenizer.encode_batch(texts[i:i + EMBEDDINGS_BATCH_SIZE])
+            ids = np.array([e.ids for e in enc], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+            feeds = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self.inputs:
+                feeds["token_type_ids"] = np.zeros_like(ids)
+            hidden = self.session.run(None, feeds)[0]
+            m = mask[..., None].astype(np.float32)
+            pooled = (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+            out.append(pooled)
+        vecs = np.vstack(out).astype(np.float32)
+        vecs /= np.clip(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12, None)
+        return vecs
+
+class HashingBackend(EmbeddingBackend):
+    """Signed feature hashing of words and character trigrams; deterministic across processes."""
+
+    def __init__(self, dim: int):
+        super().__init__()
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        words = text.lower().split()
+        grams = [f"#{w}" for w in words]
+        for w in words:
+            padded = f" {w} "
+            grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return grams
+
+    def _encode(self, texts: List[str]):
+        import numpy as np  # type: ignore
+        vecs = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for g in self._features(text or ""):
+                h = zlib.crc32(g.encode("utf-8"))
+                vecs[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        vecs /= np.clip(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12, None)
+        return vecs
+
+# -------- text-level cache --------
+def _cache_key(text: str) -> str:
+    # long texts (CV / JD summaries) are keyed by digest to keep keys small
+    return text if len(text) <= 128 else "sha1:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    LRU of normalized vectors keyed by (backend name, normalized text), with an
+    optional sqlite tier so workers and restarts share what was already embedded.
+    `_lock` guards the LRU and counters only; each thread uses its own sqlite
+    connection, so disk reads and writes never block other callers' lookups.
+    """
+
+    def __init__(self, max_items: int, db_path: str = ""):
+        self.max_items = max_items
+        self._mem: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db_path = db_path
+        self._local = threading.local()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = self._conn()
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embedding "
+                "(backend TEXT NOT NULL, key TEXT NOT NULL, vec BLOB NOT NULL, PRIMARY KEY (backend, key))"
+            )
+            self._db.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self._db_path, timeout=30)
+        return conn
+
+    def _disk_get(self, backend: str, keys: List[str]) -> Dict[str, bytes]:
+        out: Dict[str, bytes] = {}
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            rows = self._conn().execute(
+                f"SELECT key, vec FROM embedding WHERE backend = ? AND key IN ({','.join('?' * len(part))})",
+                [backend, *part],
+            ).fetchall()
+            out.update(rows)
+        return out
+
+    def _disk_put(self, backend: str, items: List[Tuple[str, bytes]]) -> None:
+        conn = self._conn()
+        conn.executemany(
+            "INSERT OR IGNORE INTO embedding (backend, key, vec) VALUES (?, ?, ?)",
+            [(backend, k, v) for k, v in items],
+        )
+        conn.commit()
+
+    def embed(self, backend: EmbeddingBackend, texts: List[str]):
+        import numpy as np  # type: ignore
+        texts = [" ".join((t or "").split()) for t in texts]
+        keys = [_cache_key(t) for t in texts]
+        found: Dict[str, Any] = {}
+        with self._lock:
+            for k in keys:
+                v = self._mem.get((backend.name, k))
+                if v is not None:
+                    self._mem.move_to_end((backend.name, k))
+                    found[k] = v
+        todo = {k: t for k, t in zip(keys, texts) if k not in found}
+        disk: Dict[str, Any] = {}
+        if todo and self._db is not None:
+            blobs = self._disk_get(backend.name, list(todo))
+            disk = {k: np.frombuffer(b, dtype=np.float32) for k, b in blobs.items()}
+            for k in disk:
+                del todo[k]
+        fresh: Dict[str, Any] = {}
+        if todo:
+            V = np.asarray(backend.encode(list(todo.values())), dtype=np.float32)
+            fresh = {k: v.copy() for k, v in zip(todo, V)}  # a cached row must not pin the whole batch
+        with self._lock:
+            self.hits += sum(1 for k in keys if k in found)
+            self.disk_hits += sum(1 for k in keys if k in disk)
+            self.misses += sum(1 for k in keys if k in fresh)
+            for k, v in (*disk.items(), *fresh.items()):
+                self._mem[(backend.name, k)] = v
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+        if fresh and self._db is not None:
+            self._disk_put(backend.name, [(k, v.tobytes()) for k, v in fresh.items()])
+        rows = [found.get(k) if k in found else disk.get(k) if k in disk else fresh[k] for k in keys]
+        return np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._mem),
+            "max_size": self.max_items,
+            "disk": self._db is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+        }
+
+_CACHE: Optional[EmbeddingCache] = None
+if EMBEDDINGS_CACHE_SIZE > 0:
+    try:
+        _CACHE = EmbeddingCache(EMBEDDINGS_CACHE_SIZE, EMBEDDINGS_CACHE_DB)
+    except Exception as e:  # unusable disk tier: memory only
+        log.warning("embedding disk cache unavailable: %s", e)
+        _CACHE = EmbeddingCache(EMBEDDINGS_CACHE_SIZE)
+
+def _load(kind: str) -> Optional[EmbeddingBackend]:
+    if kind == "minilm":
+        return MiniLMBackend(EMBEDDINGS_MODEL_PATH)
+    if kind == "onnx":
+        return OnnxBackend(EMBEDDINGS_MODEL_PATH)
+    if kind == "hashing":
+        return HashingBackend(EMBEDDINGS_DIM)
+    if kind == "none":
+        return None
+    raise ValueError("unknown EMBEDDINGS_BACKEND (expected minilm, onnx, hashing or none)")
+
+_BACKEND: Optional[EmbeddingBackend] = None
+_LOADED = False
+_LOAD_LOCK = threading.Lock()
+
+def _configured_kind() -> str:
+    if os.getenv("AI_EMBEDDINGS", "auto").lower() in ("0", "false", "off"):
+        return "none"
+    return EMBEDDINGS_BACKEND
+
+def get_backend() -> Optional[EmbeddingBackend]:
+    """The configured backend, loaded on first call; None when disabled or unavailable."""
+    global _BACKEND, _LOADED
+    if not _LOADED:
+        with _LOAD_LOCK:
+            if not _LOADED:
+                kind = _configured_kind()
+                try:
+                    _BACKEND = _load(kind)
+                except Exception as e:  # missing package or model files, unknown kind: lexical fallback
+                    log.warning("embedding backend %r unavailable: %s", kind, e)
+                    _BACKEND = None
+                _LOADED = True
+    return _BACKEND
+
+def embed(texts: List[str]):
+    """(len(texts), dim) normalized float32 matrix, or None without a backend."""
+    backend = get_backend()
+    if backend is None:
+        return None
+    if _CACHE is None or not texts:
+        return backend.encode(texts)
+    return _CACHE.embed(backend, texts)
+
+def backend_stats() -> Dict[str, Any]:
+    """Throughput counters of the loaded backend and cache hit rates (does not trigger loading)."""
+    if not _LOADED:
+        out = {"backend": _configured_kind(), "loaded": False}
+    elif _BACKEND is None:
+        out = {"backend": _configured_kind(), "loaded": False, "available": False}
+    else:
+        out = {"loaded": True, **_BACKEND.stats()}
+    out["cache"] = _CACHE.stats() if _CACHE is not None else None
+    return out
+
+def quantize(src: str, dst: str) -> None:
+    """Write a dynamically int8-quantized copy of an ONNX model."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore
+    quantize_dynamic(src, dst, weight_type=QuantType.QInt8)
+
+if __name__ == "__main__":
+    # `python -m app.embeddings quantize model.onnx model_quantized.onnx`
+    # `python -m app.embeddings bench` embeds synthetic text with the configured backend
+    import sys
+    if sys.argv[1:2] == ["quantize"] and len(sys.argv) == 4:
+        quantize(sys.argv[2], sys.argv[3])
+    elif sys.argv[1:2] == ["bench"]:
+        sample = [f"senior data engineer {i} python sql airflow spark kubernetes" for i in range(512)]
+        embed(sample[:8])  # warm up
+        embed(sample)
+        print(backend_stats())
+    else:
+        print(__doc__)
@@ -1,10 +1,25 @@
-from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Optional, Tuple, Union
 from pypdf import PdfReader
 from docx import Document as DocxDocument
+import asyncio
 import io
+import multiprocessing
+import os
+import time
 
-def extract_pdf(data: bytes) -> str:
-    reader = PdfReader(io.BytesIO(data))
+from .metrics import EXTRACTION_LATENCY
+
+# bytes, a file path, or a binary file object
+Source = Union[bytes, str, BinaryIO]
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "2"))
+
+def _open(data: Source):
+    return io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+
+def extract_pdf(data: Source) -> str:
+    reader = PdfReader(_open(data))
     out = []
     for page in reader.pages:
         try:
@@ -13,7 +28,41 @@ def extract_pdf(data: bytes) -> str:
             continue
     return "\n".join(out).strip()
 
-def extract_docx(data: bytes) -> str:
-    doc = DocxDocument(io.BytesIO(data))
+def extract_docx(data: Source) -> str:
+    doc = DocxDocument(_open(data))
     paras = [p.text for p in doc.paragraphs]
     return "\n".join(paras).strip()
+
+def extract_file(path: str, kind: str) -> str:
+    """kind: 'pdf' or 'docx'."""
+    return extract_pdf(path) if kind == "pdf" else extract_docx(path)
+
+# -------- off-event-loop extraction --------
+# Parsing is CPU-bound (pypdf is pure Python), so it runs in a small process
+# pool; the event loop only awaits the result. Workers read the spooled file
+# from disk, so no document bytes are pickled across processes.
+_POOL: Optional[ProcessPoolExecutor] = None
+
+def _pool() -> ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(
+            max_workers=max(1, EXTRACT_WORKERS),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _POOL
+
+async def extract_file_async(path: str, kind: str) -> str:
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_pool(), extract_file, path, kind)
+    finally:
+        # includes queueing for a pool worker, i.e. what the upload request waits
+        EXTRACTION_LATENCY.observe(time.perf_counter() - started, kind)
+
+def shutdown_pool() -> None:
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
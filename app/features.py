@@ -0,0 +1,139 @@
+# app/features.py
+"""
+Persistent per-document feature cache.
+
+Tokens, bullets and embeddings only depend on the CV text, so they are computed
+once at upload time and stored in `document_features`, keyed by document id and
+a hash of the exact text that gets scored. Match runs load them instead of
+re-tokenizing and re-encoding the same CVs for every job.
+"""
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, func, or_
+from sqlalchemy.orm import Session
+
+from .models import Document, DocumentFeatures
+from .scoring import CVFeatures, extract_cv_features, scan_cv, embedding_model_id
+from .vector_store import remember
+
+log = logging.getLogger(__name__)
+
+# Bump when scan_cv (tokens / bullets / signals) changes so stale rows get recomputed
+FEATURES_VERSION = 3
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def _pack(vecs) -> Optional[bytes]:
+    if vecs is None:
+        return None
+    import numpy as np  # type: ignore
+    return np.asarray(vecs, dtype=np.float16).tobytes()
+
+def _unpack(blob: Optional[bytes], dim: Optional[int]):
+    if not blob or not dim:
+        return None
+    import numpy as np  # type: ignore
+    return np.frombuffer(blob, dtype=np.float16).reshape(-1, dim).astype(np.float32)
+
+def feature_rows(docs: Iterable[Tuple[Any, str]]) -> List[Dict[str, Any]]:
+    """
+    Column values of the document_features rows for (document_id, CV text)
+    pairs (for bulk inserts). Their summary vectors go to the vector store in
+    one append.
+    """
+    rows = [_feature_row(document_id, text) for document_id, text in docs]
+    model = embedding_model_id()
+    try:
+        # append-only; rows of uploads that get rolled back are never looked up
+        remember([(r["document_id"], vec) for r, vec in rows if r["embedding_model"] == model], model)
+    except Exception:
+        log.exception("could not append to the vector store")
+    return [r for r, _ in rows]
+
+def feature_values(document_id, text: str) -> Dict[str, Any]:
+    """Column values of the document_features row for one CV text."""
+    return feature_rows([(document_id, text)])[0]
+
+def _feature_row(document_id, text: str) -> Tuple[Dict[str, Any], Any]:
+    text = (text or "").strip()
+    feats = extract_cv_features(text)
+    dim = int(feats.summary_vec.shape[-1]) if feats.summary_vec is not None else None
+    model = embedding_model_id() if dim else None
+    return {
+        "document_id": document_id,
+        "content_hash": content_hash(text),
+        "version": FEATURES_VERSION,
+        "embedding_model": model,
+        "dim": dim,
+        "tokens": feats.tokens,
+        "bullets": feats.bullets,
+        "signals": feats.signals(),
+        "summary_vec": _pack(feats.summary_vec),
+        "token_vecs": _pack(feats.token_vecs),
+    }, feats.summary_vec
+
+def compute_document_features(doc: Document) -> Optional[DocumentFeatures]:
+    """Build (not persist) the feature row for a CV document."""
+    if (doc.type or "").lower() != "cv":
+        return None
+    return DocumentFeatures(**feature_values(doc.id, doc.text_extracted))
+
+def store_document_features(db: Session, doc: Document) -> Optional[DocumentFeatures]:
+    """Compute and add/replace the feature row for `doc` (caller commits)."""
+    if doc.id is None:
+        db.flush()
+    row = compute_document_features(doc)
+    if row is None:
+        return None
+    return db.merge(row)
+
+def to_cv_features(row: DocumentFeatures, text: str, summary: bool = True) -> Optional[CVFeatures]:
+    """
+    Turn a stored row back into `CVFeatures`, or None if it is stale for `text`.
+    Vectors from a different embedding model are dropped (recomputed lazily).
+    `summary=False` leaves the summary vector undecoded (relevance known already).
+    """
+    if row is None or row.version != FEATURES_VERSION or row.content_hash != content_hash(text):
+        return None
+    if row.signals is None:  # stored before signals existed: rescan the text, keep the vectors
+        feats = scan_cv(text)
+    else:
+        feats = CVFeatures(tokens=list(row.tokens or []), bullets=list(row.bullets or []), **row.signals)
+    if row.embedding_model and row.embedding_model == embedding_model_id():
+        vec = _unpack(row.summary_vec, row.dim) if summary else None
+        feats.summary_vec = vec[0] if vec is not None else None
+        feats.token_vecs = _unpack(row.token_vecs, row.dim)
+    return feats
+
+def refresh_stale_features(db: Session, batch_size: int = 200) -> int:
+    """Recompute feature rows missing or from an older FEATURES_VERSION; returns CVs refreshed."""
+    from .skills import index_candidate_skills
+    stmt = (
+        select(Document)
+        .outerjoin(DocumentFeatures, DocumentFeatures.document_id == Document.id)
+        .where(
+            func.lower(Document.type) == "cv",
+            Document.text_extracted.isnot(None),
+            or_(DocumentFeatures.document_id.is_(None), DocumentFeatures.version != FEATURES_VERSION),
+        )
+        .limit(batch_size)
+    )
+    done = 0
+    while True:
+        docs = db.execute(stmt).scalars().all()
+        if not docs:
+            return done
+        for doc in docs:
+            row = store_document_features(db, doc)
+            index_candidate_skills(db, doc.candidate_id, row.tokens)
+        db.commit()
+        done += len(docs)
+
+if __name__ == "__main__":
+    # `python -m app.features` after a FEATURES_VERSION bump (or for CVs stored before the cache)
+    from .db import SessionLocal
+    with SessionLocal() as db:
+        print(f"refreshed features of {refresh_stale_features(db)} CV(s)")
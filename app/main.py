@@ -1,8 +1,16 @@
-from fastapi import FastAPI, Response
+import os
+import time
+
+from fastapi import FastAPI, Request, Response
 from fastapi.responses import HTMLResponse
 from sqlalchemy import text
-from .db import Base, engine
+from .db import Base, engine, dispose_async_engine
+from . import models
 from .routers import jobs, candidates, match
+from .runs import worker as match_worker
+from .extract import shutdown_pool as shutdown_extract_pool
+from .embeddings import backend_stats
+from .metrics import METRICS_ENABLED, REQUEST_LATENCY, render as render_metrics
 
 # --- one-shot tiny migration to add results_json if missing on match_run ---
 def ensure_results_column() -> None:
@@ -22,9 +30,64 @@ def ensure_results_column() -> None:
             except Exception:
                 pass
 
-# Create tables, then ensure the column exists (idempotent)
+# --- idempotent column adds for tables created before the column existed ---
+def _add_column(table: str, name: str, ddl: str) -> None:
+    for stmt in (
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {ddl};",
+        f"ALTER TABLE {table} ADD COLUMN {name} {ddl};",  # engines without IF NOT EXISTS
+    ):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(stmt))
+            return
+        except Exception:
+            continue
+
+MATCH_RUN_COLUMNS = [
+    ("status", "VARCHAR NOT NULL DEFAULT 'done'"),
+    ("workers", "INTEGER"),
+    ("total", "INTEGER"),
+    ("processed", "INTEGER NOT NULL DEFAULT 0"),
+    ("error", "TEXT"),
+    ("started_at", "TIMESTAMP"),
+    ("finished_at", "TIMESTAMP"),
+    ("heartbeat_at", "TIMESTAMP"),
+    ("incremental", "BOOLEAN NOT NULL DEFAULT FALSE"),
+    ("jd_hash", "VARCHAR(64)"),
+    ("reused", "INTEGER NOT NULL DEFAULT 0"),
+    ("min_skills", "INTEGER NOT NULL DEFAULT 0"),
+    ("top_k", "INTEGER"),
+    ("stats_json", "JSON"),
+    ("keep_top", "INTEGER"),
+    ("cascade_threshold", "DOUBLE PRECISION"),
+    ("cascade_share", "DOUBLE PRECISION"),
+    ("claim_token", "VARCHAR(32)"),
+]
+
+def ensure_match_run_columns() -> None:
+    for name, ddl in MATCH_RUN_COLUMNS:
+        _add_column("match_run", name, ddl)
+
+def ensure_match_score_schema() -> None:
+    _add_column("match_score", "cv_hash", "VARCHAR(64)")
+    _add_column("match_score", "stage", "VARCHAR(16)")
+    for index in models.MatchScore.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+def ensure_document_features_columns() -> None:
+    _add_column("document_features", "signals", "JSON")
+
+def ensure_candidate_skill_schema() -> None:
+    for index in models.CandidateSkill.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+# Create tables, then ensure the columns exist (idempotent)
 Base.metadata.create_all(bind=engine)
 ensure_results_column()
+ensure_match_run_columns()
+ensure_match_score_schema()
+ensure_document_features_columns()
+ensure_candidate_skill_schema()
 
 app = FastAPI(title="CV Score API", version="0.6.2")
 
@@ -33,6 +96,36 @@ app.include_router(jobs.router)
 app.include_router(candidates.router)
 app.include_router(match.router)
 
+# Request latency per route template (not raw path, to keep label cardinality bounded)
+if METRICS_ENABLED:
+    @app.middleware("http")
+    async def time_requests(request: Request, call_next):
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            REQUEST_LATENCY.observe(time.perf_counter() - started, request.method,
+                                    getattr(route, "path", "unmatched"), str(status))
+
+# Background match runs (MATCH_BACKGROUND=0 when a separate `python -m app.runs` process does it)
+@app.on_event("startup")
+def start_match_worker():
+    if os.getenv("MATCH_BACKGROUND", "1").lower() not in ("0", "false", "off"):
+        match_worker.start()
+
+@app.on_event("shutdown")
+def stop_match_worker():
+    match_worker.stop()
+    shutdown_extract_pool()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
+
 # Health
 @app.get("/")
 def root():
@@ -42,6 +135,14 @@ def root():
 def root_head():
     return Response(status_code=200)
 
+@app.get("/embeddings/stats")
+def embeddings_stats():
+    return backend_stats()
+
+@app.get("/metrics")
+def metrics():
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ---------- UI (HTML) ----------
 UI_HTML = """<!doctype html>
 <html>
@@ -256,30 +357,36 @@ async function createCandidate(name) {
   if (!r.ok) { console.error("createCandidate failed", r.status, await r.text()); throw new Error("Create candidate failed"); }
   return await r.json();
 }
+const UPLOAD_BATCH_SIZE = 25;
 async function uploadFiles() {
   const ok = await ensureJobSaved();
   if (!ok) return;
   const input = document.getElementById("cv_files");
   const files = Array.from(input?.files || []);
   if (!files.length) { setText("files_status", "Choose one or more PDF/DOCX", false, true); return; }
-  setText("files_status", "Uploading files…");
   const log = [];
-  for (const file of files) {
+  for (let i = 0; i < files.length; i += UPLOAD_BATCH_SIZE) {
+    const batch = files.slice(i, i + UPLOAD_BATCH_SIZE);
+    setText("files_status", `Uploading files… ${i}/${files.length}`);
+    const form = new FormData();
+    for (const file of batch) {
+      form.append("files", file);
+      form.append("labels", (file.name || "cv").replace(/\.(pdf|docx)$/i,""));
+    }
     try {
-      const label = (file.name || "cv").replace(/\.(pdf|docx)$/i,"");
-      const cand = await createCandidate(label);
-      const form = new FormData();
-      form.append("file", file);
-      const r = await fetch(`/candidates/${cand.id}/upload`, { method:"POST", body: form });
+      const r = await fetch("/candidates/batch", { method:"POST", body: form });
       if (!r.ok) throw new Error(await r.text());
-      uploadedCount += 1;
-      log.push("✓ " + label);
+      const j = await r.json();
+      for (const item of (j.results || [])) {
+        if (item.status === "ok") { uploadedCount += 1; log.push("✓ " + (item.label || item.filename)); }
+        else log.push("✗ " + item.filename + " — " + (item.error || "upload failed"));
+      }
     } catch (e) {
-      log.push("✗ " + (file.name || "cv") + " — " + (e.message || "upload failed"));
+      for (const file of batch) log.push("✗ " + (file.name || "cv") + " — " + (e.message || "upload failed"));
       console.error("uploadFiles error", e);
     }
   }
-  document.getElementById("files_log").innerHTML = log.map(x => "<div>"+x+"</div>").join("");
+  document.getElementById("files_log").innerHTML = log.map(x => "<div>"+esc(x)+"</div>").join("");
   setText("files_status", "Done", true, false);
   setDbg();
 }
@@ -321,8 +428,24 @@ async function runMatch() {
   }
   const j = await r.json();
   runId = j.id;
-  setText("run_status", "Run created ✓", true, false);
+  setText("run_status", "Run queued…");
   setDbg();
+  await waitForRun(runId);
+}
+async function waitForRun(id) {
+  while (id === runId) {
+    let s;
+    try {
+      const r = await fetch(`/match/${id}/status`);
+      if (!r.ok) throw new Error("HTTP " + r.status);
+      s = await r.json();
+    } catch (e) { setText("run_status", "Error polling run: " + (e.message || e), false, true); console.error("waitForRun error", e); return; }
+    if (s.status === "done") { setText("run_status", "Run complete ✓", true, false); return; }
+    if (s.status === "failed") { setText("run_status", "Run failed: " + (s.error || "unknown error"), false, true); return; }
+    const eta = (s.eta_seconds != null) ? ` — ~${Math.ceil(s.eta_seconds)}s left` : "";
+    setText("run_status", s.status === "queued" ? "Run queued…" : `Scoring ${s.processed}/${s.total ?? "?"}${eta}`);
+    await new Promise(res => setTimeout(res, 1000));
+  }
 }
 function extractJDBullets(text) {
   const lines = (text || "").split("\n").map(s => s.trim()).filter(Boolean);
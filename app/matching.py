@@ -0,0 +1,236 @@
+# app/matching.py
+"""
+Match engine: score candidate CVs against a compiled job and rank them.
+
+Runs serially in-process, or shards the candidate stream across a process pool
+(MATCH_WORKERS > 1). Workers are spawned fresh, load the embedding model once
+on import and receive the compiled JobProfile once through the initializer;
+only candidate chunks and result rows travel per task.
+
+This module must stay importable without the DB layer: pool workers import it.
+"""
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import chain, islice
+import heapq
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import multiprocessing
+import os
+import time
+
+from .scoring import (JobProfile, CVFeatures, compute_subscores, compute_subscores_above, compute_subscores_lexical,
+                      total_score)
+from .metrics import SCORING_LATENCY, StageTimer
+
+MATCH_WORKERS = int(os.getenv("MATCH_WORKERS", "1"))
+MATCH_CHUNK_SIZE = int(os.getenv("MATCH_CHUNK_SIZE", "200"))
+
+# (candidate_id, label, cv_text, features)
+CandidateRow = Tuple[Any, Optional[str], str, Optional[CVFeatures]]
+
+class TopK:
+    """Min-heap of the best `k` scores seen; `floor` is the k-th best (-inf until k were seen)."""
+
+    def __init__(self, k: int, scores: Iterable[float] = ()):
+        self.k = k
+        self.heap: List[float] = []
+        for s in scores:
+            self.push(s)
+
+    @property
+    def floor(self) -> float:
+        return self.heap[0] if len(self.heap) >= self.k else float("-inf")
+
+    def push(self, score: float) -> None:
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, score)
+        elif score > self.heap[0]:
+            heapq.heapreplace(self.heap, score)
+
+def score_candidate(profile: JobProfile, cand_id, label: Optional[str], cv_text: str,
+                    feats: Optional[CVFeatures] = None, timer: Optional[StageTimer] = None,
+                    top: Optional[TopK] = None, lexical: bool = False,
+                    relevance: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Scores and subscores only; suggestions are generated lazily for the rows users look at.
+    With `top`, a candidate that cannot beat the current k-th best score stops
+    before the semantic stages and comes back as a lightweight row
+    (total_score None, "pruned": True). `lexical` scores the cheap cascade
+    pass only (`top` is ignored). `relevance` maps candidate ids to their
+    precomputed role relevance (see `retrieval.summary_relevance`). "stage"
+    tells which pass produced the score.
+    """
+    stage = "lexical" if lexical or not profile.semantic else "semantic"
+    rel = relevance.get(str(cand_id)) if relevance else None
+    if lexical:
+        subs, blockers = compute_subscores_lexical(profile, cv_text, feats, timer)
+        top = None
+    elif top is None:
+        subs, blockers = compute_subscores(profile, cv_text, feats, timer, rel)
+    else:
+        scored = compute_subscores_above(profile, cv_text, top.floor, feats, timer, rel)
+        if scored is None:
+            return {"candidate_id": str(cand_id), "candidate_label": label or None, "total_score": None,
+                    "subscores": None, "hard_blockers": None, "pruned": True}
+        subs, blockers = scored
+    score = total_score(subs, blockers)
+    if top is not None:
+        top.push(score)
+    return {
+        "candidate_id": str(cand_id),
+        "candidate_label": label or None,
+        "total_score": round(score, 6),
+        "subscores": subs.to_dict(),
+        "hard_blockers": blockers,
+        "stage": stage,
+    }
+
+def cascade_survivors(scores: Iterable[Tuple[Any, float]], threshold: Optional[float] = None,
+                      share: Optional[float] = None) -> List[Any]:
+    """
+    Ids of (candidate_id, lexical score) pairs that go on to the semantic pass:
+    score >= `threshold`, or among the best `share` (0-1, rounded up) by score.
+    """
+    ranked = sorted(scores, key=lambda r: (-r[1], str(r[0])))
+    n_top = math.ceil(share * len(ranked)) if share else 0
+    return [cid for i, (cid, score) in enumerate(ranked)
+            if i < n_top or (threshold is not None and score >= threshold)]
+
+def rank_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sort by total_score and assign ranks (in place)."""
+    # candidate_id tie-break keeps ranks stable however the pool returned chunks
+    results.sort(key=lambda r: (-r["total_score"], r["candidate_id"]))
+    for i, r in enumerate(results, start=1):
+        r["rank"] = i
+    return results
+
+# -------- process pool workers --------
+_WORKER_PROFILE: Optional[JobProfile] = None
+_WORKER_TOP: Optional[TopK] = None
+_WORKER_LEXICAL = False
+_WORKER_RELEVANCE: Optional[Dict[str, float]] = None
+
+def _init_worker(profile: JobProfile, top: Optional[TopK] = None, lexical: bool = False,
+                 relevance: Optional[Dict[str, float]] = None) -> None:
+    # each worker keeps its own heap: its k-th best never exceeds the global one, so pruning stays safe
+    global _WORKER_PROFILE, _WORKER_TOP, _WORKER_LEXICAL, _WORKER_RELEVANCE
+    _WORKER_PROFILE = profile
+    _WORKER_TOP = top
+    _WORKER_LEXICAL = lexical
+    _WORKER_RELEVANCE = relevance
+
+def _score_timed(profile: JobProfile, chunk: List[CandidateRow], timer: StageTimer,
+                 top: Optional[TopK] = None, lexical: bool = False,
+                 relevance: Optional[Dict[str, float]] = None) -> Tuple[List[Dict[str, Any]], List[float]]:
+    """Score a chunk recording per-candidate latency and per-step time into `timer`."""
+    results, latencies = [], []
+    for row in chunk:
+        t = time.perf_counter()
+        results.append(score_candidate(profile, *row, timer=timer, top=top, lexical=lexical, relevance=relevance))
+        latencies.append(time.perf_counter() - t)
+    timer.add("score", sum(latencies), len(latencies))
+    return results, latencies
+
+def _score_chunk(chunk: List[CandidateRow], timed: bool = False):
+    """(results, StageTimer | None, latencies): timings travel back with the rows."""
+    if not timed:
+        return [score_candidate(_WORKER_PROFILE, *row, top=_WORKER_TOP, lexical=_WORKER_LEXICAL,
+                                relevance=_WORKER_RELEVANCE)
+                for row in chunk], None, []
+    timer = StageTimer()
+    results, latencies = _score_timed(_WORKER_PROFILE, chunk, timer, _WORKER_TOP, _WORKER_LEXICAL,
+                                      _WORKER_RELEVANCE)
+    return results, timer, latencies
+
+def _chunks(rows: Iterable[CandidateRow], size: int) -> Iterator[List[CandidateRow]]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def iter_scored_chunks(profile: JobProfile, rows: Iterable[CandidateRow],
+                       workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                       timer: Optional[StageTimer] = None, top: Optional[TopK] = None,
+                       lexical: bool = False,
+                       relevance: Optional[Dict[str, float]] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Score candidate rows chunk by chunk, yielding unranked result rows as they
+    finish (completion order). Scores serially for a single worker or chunk.
+    With a `timer`, scoring time is added to it (summed over pool workers) and
+    per-candidate latency goes to the scoring histogram. With `top`, candidates
+    that cannot reach the best `top.k` come back pruned (see `score_candidate`).
+    `lexical` runs the cheap first pass of a cascade only. `relevance` holds
+    precomputed role relevance per candidate id (sent to pool workers once).
+    """
+    workers = max(1, workers or MATCH_WORKERS)
+    chunk_size = max(1, chunk_size or MATCH_CHUNK_SIZE)
+    chunks = _chunks(rows, chunk_size)
+
+    first = next(chunks, None)
+    if first is None:
+        return
+    second = next(chunks, None)
+    if workers == 1 or second is None:
+        for chunk in chain([first], [second] if second else [], chunks):
+            if timer is None:
+                yield [score_candidate(profile, *row, top=top, lexical=lexical, relevance=relevance) for row in chunk]
+                continue
+            results, latencies = _score_timed(profile, chunk, timer, top, lexical, relevance)
+            SCORING_LATENCY.observe_many(latencies)
+            yield results
+        return
+
+    timed = timer is not None
+
+    def collect(fut) -> List[Dict[str, Any]]:
+        results, chunk_timer, latencies = fut.result()
+        if chunk_timer is not None:
+            timer.merge(chunk_timer)
+            SCORING_LATENCY.observe_many(latencies)
+        return results
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(profile, top, lexical, relevance)) as pool:
+        pending = {pool.submit(_score_chunk, first, timed), pool.submit(_score_chunk, second, timed)}
+        # keep a bounded number of chunks in flight so the DB cursor keeps streaming
+        for chunk in chunks:
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield collect(fut)
+            pending.add(pool.submit(_score_chunk, chunk, timed))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield collect(fut)
+
+def score_candidates(profile: JobProfile, rows: Iterable[CandidateRow],
+                     workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                     keep_top: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Score every candidate row and return the ranked results (only the scored ones with `keep_top`)."""
+    top = TopK(keep_top) if keep_top else None
+    results: List[Dict[str, Any]] = []
+    for chunk in iter_scored_chunks(profile, rows, workers, chunk_size, top=top):
+        results.extend(r for r in chunk if r["total_score"] is not None)
+    return rank_results(results)
+
+def score_cascade(profile: JobProfile, rows: Iterable[CandidateRow],
+                  threshold: Optional[float] = None, share: Optional[float] = None,
+                  workers: Optional[int] = None, chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Two-pass `score_candidates`: every row gets the lexical pass, only the
+    survivors (see `cascade_survivors`) are rescored semantically. Rows are kept
+    in memory between the passes; runs re-read the survivors from the DB instead.
+    """
+    rows = list(rows)
+    if not profile.semantic or (threshold is None and not share):
+        return score_candidates(profile, rows, workers, chunk_size)
+    results = {r["candidate_id"]: r for chunk in iter_scored_chunks(profile, rows, workers, chunk_size, lexical=True)
+               for r in chunk}
+    keep = set(cascade_survivors(((c, r["total_score"]) for c, r in results.items()), threshold, share))
+    for chunk in iter_scored_chunks(profile, (row for row in rows if str(row[0]) in keep), workers, chunk_size):
+        results.update((r["candidate_id"], r) for r in chunk)
+    return rank_results(list(results.values()))
@@ -0,0 +1,169 @@
+# app/metrics.py
+"""
+In-process instrumentation, no dependencies.
+
+`StageTimer` accumulates wall time per named stage of one match run (the
+summary is stored on MatchRun.stats_json). `Histogram`s are process-wide and
+rendered in the Prometheus text format by `GET /metrics`; with several API
+processes each one reports its own.
+
+METRICS_ENABLED=0 turns everything into no-ops: runs get no timer, `observe`
+returns immediately and the request middleware is not installed.
+"""
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "off")
+
+# -------- per-run stage timing --------
+class StageTimer:
+    """Seconds and call counts per stage name; cheap enough to update per candidate."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def add(self, stage: str, seconds: float, n: int = 1) -> None:
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + n
+
+    def stage(self, name: str) -> "_Stage":
+        """`with timer.stage("load"): ...`"""
+        return _Stage(self, name)
+
+    def lap(self, prefix: str = "") -> "Lap":
+        """Consecutive stages of one call: `lap("a")` charges the time since the previous lap to "a"."""
+        return Lap(self, prefix)
+
+    def timed_iter(self, stage: str, items: Iterable) -> Iterator:
+        """Yield from `items`, charging the time spent producing each item to `stage`."""
+        it = iter(items)
+        while True:
+            t = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - t, 0)
+                return
+            self.add(stage, time.perf_counter() - t)
+            yield item
+
+    def merge(self, other: "StageTimer") -> None:
+        for stage, seconds in other.seconds.items():
+            self.add(stage, seconds, other.counts.get(stage, 0))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {s: {"seconds": round(v, 6), "count": self.counts.get(s, 0)} for s, v in self.seconds.items()}
+
+class _Stage:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer: StageTimer, name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+class Lap:
+    __slots__ = ("timer", "prefix", "last")
+
+    def __init__(self, timer: StageTimer, prefix: str = ""):
+        self.timer = timer
+        self.prefix = prefix
+        self.last = time.perf_counter()
+
+    def __call__(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.timer.add(self.prefix + stage, now - self.last)
+        self.last = now
+
+def new_timer() -> Optional[StageTimer]:
+    """A StageTimer, or None when metrics are disabled (callers skip timing on None)."""
+    return StageTimer() if METRICS_ENABLED else None
+
+def stage(timer: Optional[StageTimer], name: str):
+    """`timer.stage(name)`, or a no-op context without a timer."""
+    return timer.stage(name) if timer is not None else nullcontext()
+
+# -------- Prometheus histograms --------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FAST_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 1.0)
+
+_REGISTRY: List["Histogram"] = []
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt(v: float) -> str:
+    return repr(float(v)) if v != int(v) else f"{int(v)}.0"
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def observe(self, value: float, *label_values: str) -> None:
+        if METRICS_ENABLED:
+            self.observe_many((value,), *label_values)
+
+    def observe_many(self, values: Iterable[float], *label_values: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            counts, total = series
+            for v in values:
+                counts[bisect_left(self.buckets, v)] += 1
+                total[0] += v
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(c), t[0]) for k, (c, t) in sorted(self._series.items())]
+        for label_values, counts, total in series:
+            base = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labels, label_values))
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _fmt(bound)
+                out.append(f'{self.name}_bucket{{{base}{sep}le="{le}"}} {cumulative}')
+            labels = f"{{{base}}}" if base else ""
+            out.append(f"{self.name}_sum{labels} {total!r}")
+            out.append(f"{self.name}_count{labels} {cumulative}")
+        return out
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route.",
+                            ("method", "route", "status"))
+SCORING_LATENCY = Histogram("match_candidate_scoring_seconds", "compute_subscores + total per candidate.",
+                            buckets=FAST_BUCKETS)
+RUN_STAGE_SECONDS = Histogram("match_run_stage_seconds", "Wall time per match run stage.", ("stage",))
+EXTRACTION_LATENCY = Histogram("document_extraction_seconds", "Text extraction time per uploaded file.", ("kind",))
+SUGGESTIONS_LATENCY = Histogram("match_suggestions_seconds", "Lazy suggestion generation per results page.")
+
+def render() -> str:
+    """All histograms in the Prometheus text exposition format (0.0.4)."""
+    if not METRICS_ENABLED:
+        return ""
+    lines: List[str] = []
+    for h in _REGISTRY:
+        lines.extend(h.render())
+    return "\n".join(lines) + "\n"
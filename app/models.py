@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Boolean, Integer, Float, DateTime, ForeignKey, JSON, ARRAY
+from sqlalchemy import Column, String, Text, Boolean, Integer, Float, DateTime, ForeignKey, JSON, ARRAY, LargeBinary, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from uuid import uuid4
@@ -41,6 +41,24 @@ class Document(Base):
     uploaded_at = Column(DateTime, default=datetime.utcnow)
 
     candidate = relationship("Candidate", back_populates="documents")
+    features = relationship("DocumentFeatures", back_populates="document", uselist=False)
+
+class DocumentFeatures(Base):
+    """Derived scoring features of a document's text (see app/features.py)."""
+    __tablename__ = "document_features"
+    document_id = Column(UUID(as_uuid=True), ForeignKey("document.id"), primary_key=True)
+    content_hash = Column(String(64), nullable=False)
+    version = Column(Integer, nullable=False)
+    embedding_model = Column(String)
+    dim = Column(Integer)
+    tokens = Column(JSON)
+    bullets = Column(JSON)
+    signals = Column(JSON)              # CVFeatures.signals(): quantified flags, seniority, education, languages
+    summary_vec = Column(LargeBinary)   # float16, dim values
+    token_vecs = Column(LargeBinary)    # float16, len(tokens) x dim, row-major
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    document = relationship("Document", back_populates="features")
 
 class CandidateSkill(Base):
     __tablename__ = "candidate_skill"
@@ -53,15 +71,50 @@ class CandidateSkill(Base):
 
     candidate = relationship("Candidate", back_populates="skills")
 
+    # inverted index: canonical skill -> candidate ids (see app/skills.py)
+    __table_args__ = (
+        Index("ix_candidate_skill_canonical", "canonical", "candidate_id"),
+    )
+
 class MatchRun(Base):
     __tablename__ = "match_run"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     job_id = Column(UUID(as_uuid=True), ForeignKey("job.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    # NEW: JSON storage for results used by the /match router
+    # Legacy JSON storage for results; runs now write MatchScore rows (kept for old runs)
     results_json = Column(JSON, nullable=False, default=list)
 
+    # Background execution state (see app/runs.py). Runs created before the
+    # queue existed were synchronous, hence the 'done' server default.
+    status = Column(String, nullable=False, default="queued", server_default="done")
+    workers = Column(Integer)
+    total = Column(Integer)
+    processed = Column(Integer, nullable=False, default=0, server_default="0")
+    error = Column(Text)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    # set on every claim; an executor whose token no longer matches lost the run to another worker
+    claim_token = Column(String(32))
+
+    # Incremental re-scoring: reuse rows of the latest done run with the same scoring key
+    incremental = Column(Boolean, nullable=False, default=True, server_default="false")
+    jd_hash = Column(String(64))
+    reused = Column(Integer, nullable=False, default=0, server_default="0")
+    # skill-index pre-filter: only score candidates covering >= min_skills required skills
+    min_skills = Column(Integer, nullable=False, default=0, server_default="0")
+    # two-stage match: full scoring only for the top_k nearest CV summaries (NULL = everyone)
+    top_k = Column(Integer, nullable=True)
+    # top-K ranking: candidates that cannot reach the best keep_top get lightweight rows (total_score NULL)
+    keep_top = Column(Integer, nullable=True)
+    # scoring cascade: semantic pass only for CVs whose lexical score reaches the threshold
+    # or ranks in the top share (0-1); NULL for both = semantic scoring for everyone
+    cascade_threshold = Column(Float, nullable=True)
+    cascade_share = Column(Float, nullable=True)
+    # per-stage durations, candidate counts and cache hits of the execution (METRICS_ENABLED)
+    stats_json = Column(JSON, nullable=True)
+
     job = relationship("Job", back_populates="runs")
     scores = relationship("MatchScore", back_populates="run")
 
@@ -74,5 +127,12 @@ class MatchScore(Base):
     hard_blockers = Column(ARRAY(String))
     rank = Column(Integer)
     suggestions = Column(JSON)
+    cv_hash = Column(String(64))   # CV version the score was computed from (incremental runs)
+    stage = Column(String(16))     # pass that produced the score: "lexical" or "semantic"
 
     run = relationship("MatchRun", back_populates="scores")
+
+    __table_args__ = (
+        Index("ix_match_score_run_rank", "run_id", "rank"),
+        Index("ix_match_score_run_score", "run_id", "total_score"),
+    )
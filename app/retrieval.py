@@ -0,0 +1,136 @@
+# app/retrieval.py
+"""
+Stage one of a two-stage match: nearest-neighbour retrieval over stored CV
+summary embeddings.
+
+Vectors live in the memory-mapped float16 store (app/vector_store.py) shared by
+all workers; the index only adds candidate id -> row. A JD query is one mat-vec
+product over the mapped matrix plus `argpartition`, so picking the top K out of
+100k CVs takes milliseconds; only those candidates go through the full
+`compute_subscores`. The same pass gives every indexed candidate's role
+relevance for a run (`summary_relevance`), so scoring does not decode CV
+summary vectors one by one.
+"""
+from typing import Collection, Dict, List, Optional, Tuple
+import threading
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from .models import Document
+from .scoring import embedding_model_id
+from .vector_store import StoreView, get_store
+
+class SummaryIndex:
+    """Flat inner-product index: candidate ids + their rows in a mapped matrix of unit vectors."""
+
+    def __init__(self, ids: List[str], view: Optional[StoreView], rows, model: Optional[str]):
+        self.ids = ids
+        self.view = view
+        self.rows = rows
+        self.model = model
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query_vec, k: int, allowed: Optional[Collection[str]] = None) -> List[Tuple[str, float]]:
+        """Top `k` (candidate_id, cosine) pairs, best first, optionally among `allowed` ids only."""
+        import numpy as np  # type: ignore
+        if not self.ids or query_vec is None or k <= 0:
+            return []
+        sims = self.view.dot(query_vec)[self.rows]
+        if allowed is not None:
+            allowed = set(allowed)
+            mask = np.fromiter((c in allowed for c in self.ids), dtype=bool, count=len(self.ids))
+            sims = np.where(mask, sims, -np.inf)
+            k = min(k, int(mask.sum()))
+        k = min(k, len(self.ids))
+        if k <= 0:
+            return []
+        top = np.argpartition(-sims, k - 1)[:k] if k < len(self.ids) else np.arange(len(self.ids))
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return [(self.ids[i], float(sims[i])) for i in top]
+
+    def similarities(self, query_vec, allowed: Optional[Collection[str]] = None) -> Dict[str, float]:
+        """{candidate_id: cosine of its CV summary to query_vec}, optionally for `allowed` ids only."""
+        if not self.ids or query_vec is None:
+            return {}
+        sims = self.view.dot(query_vec, cosine=True)[self.rows].tolist()
+        if allowed is None:
+            return dict(zip(self.ids, sims))
+        allowed = set(allowed)
+        return {c: s for c, s in zip(self.ids, sims) if c in allowed}
+
+_INDEX: Optional[SummaryIndex] = None
+_INDEX_KEY = None
+_INDEX_LOCK = threading.Lock()
+
+def _index_key(db: Session):
+    """Changes whenever CV documents or the vector store change."""
+    docs = db.execute(
+        select(func.count(Document.id), func.max(Document.uploaded_at)).where(func.lower(Document.type) == "cv")
+    ).one()
+    model = embedding_model_id()
+    store = get_store(model)
+    return (tuple(docs), model, store.version() if store is not None else None)
+
+def build_index(db: Session) -> SummaryIndex:
+    """
+    Map the store and pick the row of every candidate with exactly one CV
+    document. Candidates left out (several CVs, no stored vector) are not
+    ranked by stage one; callers pass them through.
+    """
+    import numpy as np  # type: ignore
+    model = embedding_model_id()
+    store = get_store(model)
+    view = store.open() if store is not None else None
+    if view is None:
+        return SummaryIndex([], None, np.zeros(0, dtype=np.int64), model)
+    single = (
+        select(Document.candidate_id)
+        .where(func.lower(Document.type) == "cv", Document.text_extracted.isnot(None), Document.text_extracted != "")
+        .group_by(Document.candidate_id)
+        .having(func.count(Document.id) == 1)
+    )
+    stmt = (
+        select(Document.id, Document.candidate_id)
+        .where(func.lower(Document.type) == "cv", Document.candidate_id.in_(single))
+        .execution_options(yield_per=5000)
+    )
+    ids: List[str] = []
+    rows: List[int] = []
+    for doc_id, cand_id in db.execute(stmt):
+        row = view.rows.get(str(doc_id))
+        if row is not None:
+            ids.append(str(cand_id))
+            rows.append(row)
+    return SummaryIndex(ids, view, np.asarray(rows, dtype=np.int64), model)
+
+def get_index(db: Session) -> SummaryIndex:
+    """Process-wide index, rebuilt when CV documents or the vector store changed since the last build."""
+    global _INDEX, _INDEX_KEY
+    key = _index_key(db)
+    with _INDEX_LOCK:
+        if _INDEX is None or key != _INDEX_KEY:
+            _INDEX = build_index(db)
+            _INDEX_KEY = key
+        return _INDEX
+
+def summary_relevance(db: Session, query_vec, candidate_ids: Collection[str]) -> Dict[str, float]:
+    """
+    Role relevance (JD summary vs CV summary cosine) of the indexed candidates
+    among `candidate_ids`, from one pass over the mapped matrix. Candidates the
+    index does not hold are left out; scoring computes theirs itself.
+    """
+    return get_index(db).similarities(query_vec, candidate_ids)
+
+def retrieve_candidates(db: Session, query_vec, k: int, candidate_ids: Collection[str]) -> List[str]:
+    """
+    Stage one: the `k` candidates (of `candidate_ids`) whose CV summaries are
+    closest to `query_vec`, plus every candidate the index cannot rank.
+    """
+    index = get_index(db)
+    indexed = set(index.ids)
+    keep = [cid for cid, _ in index.search(query_vec, k, allowed=candidate_ids)]
+    keep.extend(cid for cid in candidate_ids if cid not in indexed)
+    return keep
@@ -1,53 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from uuid import UUID
+# app/routers/candidates.py
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from dataclasses import dataclass
+from typing import List, Optional
+from uuid import UUID, uuid4
+import asyncio
+import os
+import re
+import tempfile
+import zipfile
 
-from ..db import get_db
+from ..db import get_async_db
 from .. import models, schemas
+from ..extract import extract_file_async  # <-- NEW
+from ..features import compute_document_features, feature_rows
+from ..skills import index_candidate_skills, skill_rows
+from ..uploads import MULTIPART_OVERHEAD_BYTES, FilePart, read_multipart
 
 router = APIRouter(prefix="/candidates", tags=["candidates"])
 
-@router.post("/", response_model=schemas.CandidateOut)
-def create_candidate(payload: schemas.CandidateCreate, db: Session = Depends(get_db)):
-    c = models.Candidate(external_ref=payload.external_ref, anonymized=payload.anonymized)
-    db.add(c)
-    db.commit()
-    db.refresh(c)
-    return c
-
-@router.post("/{candidate_id}/documents", response_model=schemas.DocumentOut)
-def add_document(candidate_id: UUID, payload: schemas.DocumentCreate, db: Session = Depends(get_db)):
-    c = db.get(models.Candidate, candidate_id)
-    if not c:
-        raise HTTPException(404, "Candidate not found")
-    doc = models.Document(candidate_id=candidate_id, type=payload.type, storage_uri="inline:text", text_extracted=payload.text_extracted, parsed_json=payload.parsed_json)
+async def _add_document(db: AsyncSession, doc: models.Document) -> None:
+    """Add a new document with its feature row + skill index entries (caller commits)."""
+    doc.id = doc.id or uuid4()
+    # tokenizing + embedding is CPU work: keep it off the event loop, before the session takes a connection
+    features = await run_in_threadpool(compute_document_features, doc)
     db.add(doc)
-    db.commit()
-    db.refresh(doc)
-    return doc
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
-from uuid import UUID
-
-from ..db import get_db
-from .. import models, schemas
-from ..extract import extract_pdf, extract_docx  # <-- NEW
-
-router = APIRouter(prefix="/candidates", tags=["candidates"])
+    await db.flush()
+    if features is not None:
+        await db.merge(features)
+        await db.run_sync(index_candidate_skills, doc.candidate_id, features.tokens)
 
 @router.post("/", response_model=schemas.CandidateOut)
-def create_candidate(payload: schemas.CandidateCreate, db: Session = Depends(get_db)):
+async def create_candidate(payload: schemas.CandidateCreate, db: AsyncSession = Depends(get_async_db)):
     c = models.Candidate(external_ref=payload.external_ref, anonymized=payload.anonymized)
     db.add(c)
-    db.commit()
-    db.refresh(c)
+    await db.commit()
+    await db.refresh(c)
     return c
 
 @router.post("/{candidate_id}/documents", response_model=schemas.DocumentOut)
-def add_document(candidate_id: UUID, payload: schemas.DocumentCreate, db: Session = Depends(get_db)):
-    c = db.get(models.Candidate, candidate_id)
+async def add_document(candidate_id: UUID, payload: schemas.DocumentCreate, db: AsyncSession = Depends(get_async_db)):
+    c = await db.get(models.Candidate, candidate_id)
     if not c:
         raise HTTPException(404, "Candidate not found")
+    await db.commit()  # hand the connection back while features are computed
     doc = models.Document(
         candidate_id=candidate_id,
         type=payload.type,
@@ -55,33 +53,56 @@ def add_document(candidate_id: UUID, payload: schemas.DocumentCreate, db: Sessio
         text_extracted=payload.text_extracted,
         parsed_json=payload.parsed_json,
     )
-    db.add(doc)
-    db.commit()
-    db.refresh(doc)
+    await _add_document(db, doc)
+    await db.commit()
+    await db.refresh(doc)
     return doc
 
 # ---------- NEW: file upload endpoint (PDF/DOCX) ----------
-@router.post("/{candidate_id}/upload", response_model=schemas.DocumentOut)
-async def upload_cv(candidate_id: UUID, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    c = db.get(models.Candidate, candidate_id)
-    if not c:
-        raise HTTPException(404, "Candidate not found")
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024  # 10 MB cap
 
-    name = (file.filename or "").lower()
-    if not (name.endswith(".pdf") or name.endswith(".docx")):
-        raise HTTPException(415, "Only .pdf or .docx files are supported")
+def _file_kind(name: str) -> Optional[str]:
+    name = (name or "").lower()
+    if name.endswith(".pdf"):
+        return "pdf"
+    if name.endswith(".docx"):
+        return "docx"
+    return None
 
-    data = await file.read()
-    if len(data) > 10 * 1024 * 1024:  # 10 MB cap
-        raise HTTPException(413, "File too large (max 10 MB)")
+def _upload_suffix(part: FilePart) -> Optional[str]:
+    kind = _file_kind(part.filename)
+    if kind is None:
+        part.error = "Only .pdf or .docx files are supported"
+        return None
+    return "." + kind
 
-    try:
-        if name.endswith(".pdf"):
-            text = extract_pdf(data)
-        else:
-            text = extract_docx(data)
-    except Exception as e:
-        raise HTTPException(400, f"Could not extract text: {e}")
+# multipart body: one `file` field (PDF/DOCX), read by the route itself so the cap holds while receiving
+UPLOAD_BODY = {"content": {"multipart/form-data": {"schema": {
+    "type": "object",
+    "required": ["file"],
+    "properties": {"file": {"type": "string", "format": "binary"}},
+}}}, "required": True}
+
+@router.post("/{candidate_id}/upload", response_model=schemas.DocumentOut,
+             openapi_extra={"requestBody": UPLOAD_BODY})
+async def upload_cv(candidate_id: UUID, request: Request, db: AsyncSession = Depends(get_async_db)):
+    c = await db.get(models.Candidate, candidate_id)
+    if not c:
+        raise HTTPException(404, "Candidate not found")
+    await db.commit()  # hand the connection back while the body streams in and is extracted
+
+    with tempfile.TemporaryDirectory(prefix="cv-upload-") as spool_dir:
+        form = await read_multipart(request, spool_dir, MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+                                    MAX_UPLOAD_BYTES, _upload_suffix)
+        file = form.file("file")
+        if file is None:
+            raise HTTPException(422, "Missing file")
+        if file.error:
+            raise HTTPException(415, file.error)
+        try:
+            text = await extract_file_async(file.path, _file_kind(file.filename))
+        except Exception as e:
+            raise HTTPException(400, f"Could not extract text: {e}")
 
     if not text.strip():
         raise HTTPException(422, "No text could be extracted from this file")
@@ -93,7 +114,188 @@ async def upload_cv(candidate_id: UUID, file: UploadFile = File(...), db: Sessio
         text_extracted=text,
         parsed_json=None,
     )
-    db.add(doc)
-    db.commit()
-    db.refresh(doc)
+    await _add_document(db, doc)
+    await db.commit()
+    await db.refresh(doc)
     return doc
+
+# ---------- bulk ingestion: many PDF/DOCX (or one zip) per request ----------
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "500"))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(512 * 1024 * 1024)))  # whole request body
+MAX_ARCHIVE_BYTES = 200 * 1024 * 1024
+MAX_UNPACKED_BYTES = int(os.getenv("MAX_UNPACKED_BYTES", str(1024 * 1024 * 1024)))  # all zip members together
+UNPACK_CHUNK_BYTES = 256 * 1024
+
+@dataclass
+class _BatchItem:
+    filename: str
+    label: str
+    kind: Optional[str] = None
+    path: Optional[str] = None
+    error: Optional[str] = None
+    text: Optional[str] = None
+
+def _label_from(name: str) -> str:
+    return re.sub(r"\.(pdf|docx)$", "", os.path.basename(name or ""), flags=re.I) or "cv"
+
+def _too_many_files() -> HTTPException:
+    return HTTPException(413, f"Too many files (max {MAX_BATCH_FILES} per batch)")
+
+def _archive_members(zf: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    members = []
+    for info in zf.infolist():
+        base = os.path.basename(info.filename)
+        if info.is_dir() or not base or base.startswith(".") or info.filename.startswith("__MACOSX/"):
+            continue
+        members.append(info)
+    return members
+
+def _unpack_archive(path: str, spool_dir: str, max_files: int) -> List[_BatchItem]:
+    """
+    Spool every PDF/DOCX member of a zip to its own temp file. The member count
+    is checked before anything is extracted; each member is capped while
+    copying, and so is the total written across members.
+    """
+    items = []
+    written = 0
+    with zipfile.ZipFile(path) as zf:
+        members = _archive_members(zf)
+        if len(members) > max_files:
+            raise _too_many_files()
+        for info in members:
+            name = info.filename
+            item = _BatchItem(filename=name, label=_label_from(name), kind=_file_kind(name))
+            items.append(item)
+            if item.kind is None:
+                item.error = "Only .pdf or .docx files are supported"
+                continue
+            fd, dst = tempfile.mkstemp(prefix="cv-upload-", suffix="." + item.kind, dir=spool_dir)
+            size = 0
+            with os.fdopen(fd, "wb") as out, zf.open(info) as src:
+                # don't trust the header's file_size: count what actually comes out
+                while chunk := src.read(UNPACK_CHUNK_BYTES):
+                    size += len(chunk)
+                    written += len(chunk)
+                    if written > MAX_UNPACKED_BYTES:
+                        raise HTTPException(413, f"Archive too large once unpacked "
+                                                 f"(max {MAX_UNPACKED_BYTES // (1024 * 1024)} MB)")
+                    if size > MAX_UPLOAD_BYTES:
+                        item.error = "File too large (max 10 MB)"
+                        break
+                    out.write(chunk)
+            if item.error is None:
+                item.path = dst
+            else:
+                os.unlink(dst)
+    return items
+
+async def _extract_item(item: _BatchItem) -> None:
+    try:
+        item.text = (await extract_file_async(item.path, item.kind)).strip()
+    except Exception as e:
+        item.error = f"Could not extract text: {e}"
+        return
+    if not item.text:
+        item.error = "No text could be extracted from this file"
+
+def _form_bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "on", "yes", "y", "t")
+
+# multipart body: `files` (repeated), `labels` (repeated), optional `archive` (zip), `anonymized`
+BATCH_BODY = {"content": {"multipart/form-data": {"schema": {
+    "type": "object",
+    "properties": {
+        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+        "labels": {"type": "array", "items": {"type": "string"}},
+        "archive": {"type": "string", "format": "binary"},
+        "anonymized": {"type": "boolean", "default": False},
+    },
+}}}, "required": True}
+
+@router.post("/batch", response_model=schemas.BatchIngestOut, openapi_extra={"requestBody": BATCH_BODY})
+async def ingest_batch(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Create one candidate + CV document per file. `labels[i]` names `files[i]`
+    (default: file name); zip members are named after their file name. Text is
+    extracted in parallel and everything is written with bulk inserts in one
+    transaction. Per-file failures are reported, not raised; more than
+    MAX_BATCH_FILES files is rejected before the extra files are spooled.
+    """
+    n_files = 0
+
+    def count(part: FilePart) -> None:
+        nonlocal n_files
+        if part.name == "files":
+            n_files += 1
+            if n_files > MAX_BATCH_FILES:
+                raise _too_many_files()
+
+    def suffix(part: FilePart) -> Optional[str]:
+        if part.name == "archive":
+            part.max_bytes = MAX_ARCHIVE_BYTES
+            return ".zip"
+        if part.name != "files":
+            part.error = "Unexpected file field"
+            return None
+        return _upload_suffix(part)
+
+    items: List[_BatchItem] = []
+    with tempfile.TemporaryDirectory(prefix="cv-batch-") as spool_dir:
+        form = await read_multipart(request, spool_dir, MAX_BATCH_BYTES, MAX_UPLOAD_BYTES, suffix,
+                                    on_file=count, skip_oversized=True)
+        labels = form.getlist("labels")
+        files = [f for f in form.files if f.name == "files"]
+        for i, f in enumerate(files):
+            label = (labels[i] if i < len(labels) else "") or _label_from(f.filename)
+            items.append(_BatchItem(filename=f.filename or f"file-{i + 1}", label=label,
+                                    kind=_file_kind(f.filename), path=f.path, error=f.error))
+
+        archive = form.file("archive")
+        if archive is not None:
+            if archive.error:
+                raise HTTPException(413, archive.error)
+            try:
+                items.extend(await run_in_threadpool(_unpack_archive, archive.path, spool_dir,
+                                                     MAX_BATCH_FILES - len(items)))
+            except zipfile.BadZipFile:
+                raise HTTPException(400, "Not a valid zip archive")
+
+        if not items:
+            raise HTTPException(400, "No files provided")
+
+        await asyncio.gather(*(_extract_item(it) for it in items if it.error is None))
+
+    anonymized = _form_bool(form.get("anonymized", "false"))
+    ok = [it for it in items if it.error is None]
+    cand_rows, doc_rows = [], []
+    for it in ok:
+        cand_id, doc_id = uuid4(), uuid4()
+        cand_rows.append({"id": cand_id, "external_ref": it.label, "anonymized": anonymized})
+        doc_rows.append({
+            "id": doc_id,
+            "candidate_id": cand_id,
+            "type": "cv",
+            "storage_uri": f"upload:{it.filename}",
+            "text_extracted": it.text,
+            "parsed_json": None,
+        })
+    feat_rows = await run_in_threadpool(feature_rows, [(d["id"], d["text_extracted"]) for d in doc_rows])
+    if cand_rows:
+        await db.execute(insert(models.Candidate), cand_rows)
+        await db.execute(insert(models.Document), doc_rows)
+        await db.execute(insert(models.DocumentFeatures), feat_rows)
+        skills = [r for d, f in zip(doc_rows, feat_rows) for r in skill_rows(d["candidate_id"], f["tokens"])]
+        if skills:
+            await db.execute(insert(models.CandidateSkill), skills)
+        await db.commit()
+
+    ids = iter(zip(cand_rows, doc_rows))
+    results = []
+    for it in items:
+        out = schemas.BatchItemOut(filename=it.filename, label=it.label,
+                                   status="error" if it.error else "ok", error=it.error)
+        if it.error is None:
+            cand, doc = next(ids)
+            out.candidate_id, out.document_id = cand["id"], doc["id"]
+        results.append(out)
+    return schemas.BatchIngestOut(created=len(ok), failed=len(items) - len(ok), results=results)
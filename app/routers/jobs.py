@@ -1,14 +1,15 @@
+# app/routers/jobs.py
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
-from ..db import get_db
+from ..db import get_async_db
 from .. import models, schemas
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
 @router.post("/", response_model=schemas.JobOut)
-def create_job(payload: schemas.JobCreate, db: Session = Depends(get_db)):
+async def create_job(payload: schemas.JobCreate, db: AsyncSession = Depends(get_async_db)):
     job = models.Job(
         title=payload.title,
         department=payload.department,
@@ -19,13 +20,13 @@ def create_job(payload: schemas.JobCreate, db: Session = Depends(get_db)):
         jd_preferred_skills=payload.jd_preferred_skills,
     )
     db.add(job)
-    db.commit()
-    db.refresh(job)
+    await db.commit()
+    await db.refresh(job)
     return job
 
 @router.get("/{job_id}", response_model=schemas.JobOut)
-def get_job(job_id: UUID, db: Session = Depends(get_db)):
-    job = db.get(models.Job, job_id)
+async def get_job(job_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    job = await db.get(models.Job, job_id)
     if not job:
         raise HTTPException(404, "Job not found")
     return job
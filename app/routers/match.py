@@ -1,81 +1,262 @@
 # app/routers/match.py
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
-from ..db import get_db
-from ..models import Job, Candidate, Document, MatchRun
-from ..scoring import compute_subscores, total_score, suggest_improvements
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import select, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import Any, Dict, Iterator, List, Optional
+from datetime import datetime
+from uuid import UUID
+import orjson
+from ..db import get_async_db, SessionLocal
+from ..models import Job, Candidate, MatchRun, MatchScore
+from ..runs import (execute_run, ensure_suggestions, iter_candidate_cvs, job_to_scoring_dict, new_claim_token,
+                    run_progress, worker)
+from ..scoring import score_matrix
 
 router = APIRouter(prefix="/match", tags=["match"])
 
-def _job_to_scoring_dict(job: Job) -> Dict[str, Any]:
-    return {
-        "title": job.title or "",
-        "jd_text": job.jd_text or "",
-        "jd_required_skills": job.jd_required_skills or job.jd_skills or [],
-        "jd_preferred_skills": job.jd_preferred_skills or [],
-        "mandatory_certs": [],  # optional field
-    }
-
-def _candidate_cv_text(db: Session, cand_id) -> str:
-    docs = db.query(Document).filter(Document.candidate_id == cand_id).all()
-    parts = []
-    for d in docs:
-        if (d.type or "").lower() == "cv":
-            if d.text_extracted:
-                parts.append(d.text_extracted)
-    return "\n".join(parts).strip()
-
 @router.post("/{job_id}/run")
-def run_match(job_id: str, db: Session = Depends(get_db)):
-    job = db.get(Job, job_id)
+async def run_match(
+    job_id: UUID,
+    workers: Optional[int] = Query(None, ge=1, le=64),
+    wait: bool = Query(False, description="Score inside this request instead of queueing"),
+    incremental: bool = Query(True, description="Reuse scores of unchanged CVs from the last run"),
+    min_skills: int = Query(0, ge=0, description="Only score candidates mentioning at least this many required skills"),
+    top_k: Optional[int] = Query(None, ge=1, description="Fully score only the K CVs closest to the JD summary"),
+    keep_top: Optional[int] = Query(None, ge=1, description="Rank only the best K; skip semantic scoring for CVs that cannot reach them"),
+    cascade_threshold: Optional[float] = Query(None, ge=0.0, le=1.0,
+                                               description="Cascade: score semantically only CVs whose lexical score reaches this"),
+    cascade_share: Optional[float] = Query(None, gt=0.0, le=1.0,
+                                           description="Cascade: also score semantically the best share (0-1) by lexical score"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    job = await db.get(Job, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    jd = _job_to_scoring_dict(job)
+    run = MatchRun(job_id=job.id, status="queued", workers=workers, incremental=incremental,
+                   min_skills=min_skills, top_k=top_k, keep_top=keep_top,
+                   cascade_threshold=cascade_threshold, cascade_share=cascade_share)
+    if wait:
+        # claimed up front so the background worker leaves it alone
+        run.status = "running"
+        run.started_at = run.heartbeat_at = datetime.utcnow()
+        run.claim_token = new_claim_token()
+    db.add(run)
+    await db.commit()
 
-    # Collect candidates that at least have a CV document
-    cands = db.query(Candidate).all()
+    if wait:
+        # scoring is CPU work with its own sync sessions: run it on a worker thread
+        await run_in_threadpool(execute_run, run.id, run.claim_token)
+        await db.refresh(run)
+    else:
+        worker.notify()
+    return {"id": str(run.id), "status": run.status}
 
-    results: List[Dict[str, Any]] = []
-    for c in cands:
-        cv_text = _candidate_cv_text(db, c.id)
-        if not cv_text:
-            continue
+@router.get("/{run_id}/status")
+async def get_status(run_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    run = await db.get(MatchRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run_progress(run)
 
-        subs, blockers = compute_subscores(jd, cv_text)
-        score = total_score(subs, blockers)
-        suggestions = suggest_improvements(jd, cv_text, subs, blockers)
+RESULTS_PAGE_SIZE = 50  # JSON page size without top_n/limit; full exports go through ndjson
 
-        results.append({
-            "candidate_id": str(c.id),
-            "candidate_label": c.external_ref or None,
-            "total_score": round(score, 6),
-            "subscores": subs.to_dict(),
-            "hard_blockers": blockers,
-            "suggestions": suggestions,
-        })
+def _legacy_results(run: MatchRun, top_n: int, offset: int, limit: Optional[int],
+                    min_score: Optional[float], max_score: Optional[float]) -> Dict[str, Any]:
+    """Runs from before match_score rows existed keep their results in results_json."""
+    res = [r for r in (run.results_json or [])
+           if (min_score is None or r["total_score"] >= min_score)
+           and (max_score is None or r["total_score"] <= max_score)]
+    n = top_n or limit
+    page = res[offset:offset + n] if n else res[offset:]
+    return {"results": page, "count": len(res)}
 
-    # sort + rank
-    results.sort(key=lambda r: r["total_score"], reverse=True)
-    for i, r in enumerate(results, start=1):
-        r["rank"] = i
-        # optional delta to top-5
-        if i > 5 and results[4]["total_score"] > 0:
-            r["suggestions"]["delta_to_top5"] = max(0.0, results[4]["total_score"] - r["total_score"])
+def _delta_to_top5(rank: Optional[int], score: float, fifth: Optional[float]) -> float:
+    if fifth is None or fifth <= 0:
+        return 0
+    in_top5 = rank <= 5 if rank is not None else score >= fifth
+    return 0 if in_top5 else max(0.0, fifth - score)
 
-    # persist to MatchRun.results_json
-    run = MatchRun(job_id=job.id, results_json=results)
-    db.add(run)
-    db.commit()
-    return {"id": str(run.id)}
+def _result_item(score: MatchScore, label: Optional[str], fifth: Optional[float]) -> Dict[str, Any]:
+    suggestions = dict(score.suggestions or {})
+    suggestions["delta_to_top5"] = _delta_to_top5(score.rank, score.total_score, fifth)
+    return {
+        "candidate_id": str(score.candidate_id),
+        "candidate_label": label or None,
+        "total_score": score.total_score,
+        "subscores": score.subscores,
+        "hard_blockers": score.hard_blockers or [],
+        "suggestions": suggestions,
+        "rank": score.rank,
+        "stage": score.stage,
+    }
+
+# -------- NDJSON export --------
+STREAM_BATCH = 500
+
+def _stream_results(run_id, stmt, fifth: Optional[float]) -> Iterator[bytes]:
+    """
+    One JSON object per line, read through a server-side cursor batch by batch.
+    Runs after the request's session is closed, so it opens its own: `reader`
+    holds the cursor, `writer` memoizes the suggestions generated per batch.
+    """
+    with SessionLocal() as reader, SessionLocal() as writer:
+        run = reader.get(MatchRun, run_id)
+        result = reader.execute(stmt.execution_options(yield_per=STREAM_BATCH))
+        for batch in result.partitions():
+            scores = [score for score, _ in batch]
+            fresh = [score for score in scores if score.suggestions is None]
+            ensure_suggestions(reader, run, scores)
+            if fresh:
+                writer.execute(update(MatchScore), [
+                    {"run_id": s.run_id, "candidate_id": s.candidate_id, "suggestions": s.suggestions} for s in fresh
+                ])
+                writer.commit()
+            yield b"".join(orjson.dumps(_result_item(score, label, fifth)) + b"\n" for score, label in batch)
+            # keep memory flat: drop the batch's rows (and loaded CV features) from the identity map
+            for obj in list(reader.identity_map.values()):
+                if obj is not run:
+                    reader.expunge(obj)
+
+def _page_suggestions(run_id, candidate_ids: List[UUID]) -> Dict[UUID, Dict[str, Any]]:
+    """
+    `ensure_suggestions` for one results page, meant for a worker thread:
+    generating suggestions is CPU work, so it gets its own sync session.
+    """
+    with SessionLocal() as db:
+        run = db.get(MatchRun, run_id)
+        scores = db.execute(
+            select(MatchScore).where(MatchScore.run_id == run_id, MatchScore.candidate_id.in_(candidate_ids))
+        ).scalars().all()
+        ensure_suggestions(db, run, scores)
+        db.commit()
+        return {s.candidate_id: s.suggestions for s in scores}
+
+def _candidate_cv(candidate_id: UUID):
+    """
+    The candidate's (id, label, cv_text, features) row, or None, meant for a
+    worker thread: decoding stored features (or computing them, with the
+    embedding model) is CPU work, so it gets its own sync session.
+    """
+    with SessionLocal() as db:
+        rows = list(iter_candidate_cvs(db, candidate_ids=[candidate_id]))
+        return rows[0] if rows else None
+
+def _stream_legacy(rows: List[Dict[str, Any]]) -> Iterator[bytes]:
+    for i in range(0, len(rows), STREAM_BATCH):
+        yield b"".join(orjson.dumps(r) + b"\n" for r in rows[i:i + STREAM_BATCH])
 
 @router.get("/{run_id}/results")
-def get_results(run_id: str, top_n: int = Query(0, ge=0), db: Session = Depends(get_db)):
-    run = db.get(MatchRun, run_id)
+async def get_results(
+    run_id: UUID,
+    top_n: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000,
+                                 description=f"JSON page size (default {RESULTS_PAGE_SIZE} without top_n)"),
+    min_score: Optional[float] = Query(None, ge=0.0, le=1.0),
+    max_score: Optional[float] = Query(None, ge=0.0, le=1.0),
+    format: str = Query("json", pattern="^(json|ndjson)$",
+                        description="ndjson streams every matching row (no `limit` cap), one object per line"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if format == "json" and not (top_n or limit):
+        limit = RESULTS_PAGE_SIZE  # suggestions are generated per returned row: never for a whole run at once
+    run = await db.get(MatchRun, run_id)
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
-    res = run.results_json or []
-    if top_n and top_n > 0:
-        res = res[:top_n]
-    return {"results": res}
+    meta = {"status": run.status, "processed": run.processed or 0, "total": run.total}
+    stream_headers = {f"X-Run-{k.title()}": str(v) for k, v in meta.items() if v is not None}
+
+    has_rows = (await db.execute(select(MatchScore.candidate_id).where(MatchScore.run_id == run.id).limit(1))).first()
+    if not has_rows and run.results_json:
+        legacy = _legacy_results(run, top_n, offset, limit, min_score, max_score)
+        if format == "ndjson":
+            return StreamingResponse(_stream_legacy(legacy["results"]), media_type="application/x-ndjson",
+                                     headers=stream_headers)
+        return ORJSONResponse({**legacy, **meta})
+
+    # rows pruned by a keep_top run carry no score and are not listed
+    filters = [MatchScore.run_id == run.id, MatchScore.total_score.isnot(None)]
+    if min_score is not None:
+        filters.append(MatchScore.total_score >= min_score)
+    if max_score is not None:
+        filters.append(MatchScore.total_score <= max_score)
+
+    # ranks are assigned when the run completes; partial results are ordered by score
+    order = (
+        (MatchScore.rank,) if run.status == "done"
+        else (MatchScore.total_score.desc(), MatchScore.candidate_id)
+    )
+    stmt = (
+        select(MatchScore, Candidate.external_ref)
+        .outerjoin(Candidate, Candidate.id == MatchScore.candidate_id)
+        .where(*filters)
+        .order_by(*order)
+        .offset(offset)
+    )
+    n = top_n or limit
+    if n:
+        stmt = stmt.limit(n)
+    fifth = (await db.execute(
+        select(MatchScore.total_score)
+        .where(MatchScore.run_id == run.id, MatchScore.total_score.isnot(None))
+        .order_by(MatchScore.total_score.desc())
+        .offset(4).limit(1)
+    )).scalar()
+
+    if format == "ndjson":
+        return StreamingResponse(_stream_results(run.id, stmt, fifth), media_type="application/x-ndjson",
+                                 headers=stream_headers)
+
+    rows = (await db.execute(stmt)).all()
+    count = (await db.execute(select(func.count()).select_from(MatchScore).where(*filters))).scalar() or 0
+    await db.commit()  # hand the connection back: _page_suggestions uses its own
+
+    # suggestions are generated on demand for this page only, then memoized on the row
+    missing = [score for score, _ in rows if score.suggestions is None]
+    if missing:
+        generated = await run_in_threadpool(_page_suggestions, run.id, [s.candidate_id for s in missing])
+        for score in missing:
+            set_committed_value(score, "suggestions", generated.get(score.candidate_id))
+
+    results = [_result_item(score, label, fifth) for score, label in rows]
+    return ORJSONResponse({"results": results, "count": count, **meta})
+
+@router.get("/candidate/{candidate_id}/best-jobs")
+async def best_jobs(
+    candidate_id: UUID,
+    top_n: int = Query(10, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Score one candidate against every job in a single batch pass and return the best openings."""
+    if not await db.get(Candidate, candidate_id):
+        raise HTTPException(status_code=404, detail="Candidate not found")
+    jobs = (await db.execute(select(Job).order_by(Job.created_at))).scalars().all()
+    await db.commit()  # hand the connection back before the threadpool work below
+
+    cv = await run_in_threadpool(_candidate_cv, candidate_id)
+    if cv is None:
+        raise HTTPException(status_code=404, detail="Candidate has no CV text")
+    _, label, cv_text, feats = cv
+    if not jobs:
+        return {"candidate_id": str(candidate_id), "candidate_label": label or None, "results": [], "count": 0}
+    grid = await run_in_threadpool(score_matrix, [job_to_scoring_dict(j) for j in jobs], [cv_text], [feats])
+    # job id breaks ties, as candidate id does for run ranks
+    order = sorted(range(len(jobs)), key=lambda j: (-grid.total[0, j], str(jobs[j].id)))[:top_n]
+
+    results = []
+    for rank, j in enumerate(order, start=1):
+        subs, blockers = grid.pair(0, j)
+        results.append({
+            "job_id": str(jobs[j].id),
+            "title": jobs[j].title,
+            "total_score": round(float(grid.total[0, j]), 6),
+            "subscores": subs.to_dict(),
+            "hard_blockers": blockers,
+            "rank": rank,
+        })
+    return {"candidate_id": str(candidate_id), "candidate_label": label or None,
+            "results": results, "count": len(jobs)}
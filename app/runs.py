@@ -0,0 +1,603 @@
+# app/runs.py
+"""
+Match run execution.
+
+`POST /match/{job_id}/run` only queues a MatchRun row. A background worker
+thread (one per API process) claims queued runs from the match_run table and
+executes them, committing progress and partial results as it goes. The table
+is the queue, so runs survive restarts: a 'running' run whose heartbeat went
+stale is claimed again by the next worker that polls.
+
+Every claim writes a fresh claim_token. The executor keeps heartbeat_at fresh
+from a timer thread and checks the token before each commit, so an executor
+that was presumed dead and whose run got re-claimed stops instead of racing
+the new owner.
+"""
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Any, Collection, Dict, Iterator, List, Optional, Union
+from uuid import UUID, uuid4
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import Select, select, insert, update, delete, func, literal, or_, and_
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .models import Job, Candidate, Document, DocumentFeatures, MatchRun, MatchScore
+from .features import to_cv_features
+from .scoring import SCORING_VERSION, JobProfile, Subscores, compile_job, embedding_model_id, suggest_improvements
+from .matching import CandidateRow, TopK, cascade_survivors, iter_scored_chunks
+from .skills import candidates_covering
+from .retrieval import retrieve_candidates, summary_relevance
+from .embeddings import backend_stats
+from .vector_store import VECTOR_COMPACT_SECONDS, compact_if_fragmented
+from .metrics import RUN_STAGE_SECONDS, SUGGESTIONS_LATENCY, StageTimer, new_timer, stage
+
+log = logging.getLogger(__name__)
+
+MATCH_POLL_SECONDS = float(os.getenv("MATCH_POLL_SECONDS", "2"))
+MATCH_STALE_SECONDS = float(os.getenv("MATCH_STALE_SECONDS", "120"))
+MATCH_PROGRESS_SECONDS = float(os.getenv("MATCH_PROGRESS_SECONDS", "2"))
+MATCH_HEARTBEAT_SECONDS = float(os.getenv("MATCH_HEARTBEAT_SECONDS", str(max(1.0, MATCH_STALE_SECONDS / 4))))
+
+# -------- loading --------
+def job_to_scoring_dict(job: Job) -> Dict[str, Any]:
+    return {
+        "title": job.title or "",
+        "jd_text": job.jd_text or "",
+        "jd_required_skills": job.jd_required_skills or job.jd_skills or [],
+        "jd_preferred_skills": job.jd_preferred_skills or [],
+        "mandatory_certs": [],  # optional field
+    }
+
+def _cv_documents():
+    return (
+        (func.lower(Document.type) == "cv"),
+        Document.text_extracted.isnot(None),
+        Document.text_extracted != "",
+    )
+
+def iter_candidate_cvs(db: Session, candidate_ids: Optional[Collection] = None,
+                       candidate_filter: Union[Select, Collection, None] = None,
+                       batch_size: int = 500,
+                       known_relevance: Collection[str] = ()) -> Iterator[CandidateRow]:
+    """
+    Stream (candidate_id, label, cv_text, features) for every candidate with CV text
+    (or only `candidate_ids` / ids in `candidate_filter`, a list or SELECT).
+    One query over CV documents, read through a server-side cursor. Summary
+    vectors of candidates in `known_relevance` are not decoded.
+    """
+    stmt = (
+        select(Document.candidate_id, Candidate.external_ref, Document.text_extracted, DocumentFeatures)
+        .join(Candidate, Candidate.id == Document.candidate_id)
+        .outerjoin(DocumentFeatures, DocumentFeatures.document_id == Document.id)
+        .where(*_cv_documents())
+        .order_by(Document.candidate_id, Document.uploaded_at)
+        .execution_options(yield_per=batch_size)
+    )
+    if candidate_ids is not None:
+        if not candidate_ids:
+            return
+        stmt = stmt.where(Document.candidate_id.in_(list(candidate_ids)))
+    if candidate_filter is not None:
+        stmt = stmt.where(Document.candidate_id.in_(candidate_filter))
+    rows = db.execute(stmt)
+    for cand_id, group in groupby(rows, key=lambda r: r.candidate_id):
+        group = list(group)
+        text = "\n".join(r.text_extracted for r in group).strip()
+        if not text:
+            continue
+        # stored features describe a single document's text; reuse them when that is all we score
+        feats = (to_cv_features(group[0].DocumentFeatures, text, str(cand_id) not in known_relevance)
+                 if len(group) == 1 else None)
+        yield cand_id, group[0].external_ref, text, feats
+
+def candidate_cv_versions(db: Session, candidate_filter: Union[Select, Collection, None] = None) -> Dict[str, str]:
+    """
+    {candidate_id: cv_hash} for every candidate with CV text. Documents are
+    immutable once stored, so hashing their ids + upload times identifies the
+    CV content without loading any text.
+    """
+    stmt = (
+        select(Document.candidate_id, Document.id, Document.uploaded_at)
+        .where(*_cv_documents())
+        .order_by(Document.candidate_id, Document.uploaded_at, Document.id)
+    )
+    if candidate_filter is not None:
+        stmt = stmt.where(Document.candidate_id.in_(candidate_filter))
+    out: Dict[str, str] = {}
+    for cand_id, group in groupby(db.execute(stmt), key=lambda r: r.candidate_id):
+        sig = "|".join(f"{r.id}@{r.uploaded_at.isoformat() if r.uploaded_at else ''}" for r in group)
+        out[str(cand_id)] = hashlib.sha1(sig.encode("utf-8")).hexdigest()
+    return out
+
+def scoring_key(profile: JobProfile) -> str:
+    """Scores are reusable across runs only for the same JD content, embedding model and scoring rules."""
+    key = f"{profile.fingerprint}:{embedding_model_id() or 'lexical'}:{SCORING_VERSION}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def latest_reusable_run(db: Session, run: MatchRun) -> Optional[MatchRun]:
+    stmt = (
+        select(MatchRun)
+        .where(
+            MatchRun.job_id == run.job_id,
+            MatchRun.jd_hash == run.jd_hash,
+            MatchRun.status == "done",
+            MatchRun.id != run.id,
+        )
+        .order_by(MatchRun.created_at.desc())
+        .limit(1)
+    )
+    return db.execute(stmt).scalars().first()
+
+# -------- execution --------
+class ClaimLost(Exception):
+    """The run was claimed again by another worker; this executor must stop."""
+
+def new_claim_token() -> str:
+    return uuid4().hex
+
+def claim_next_run(db: Session) -> Optional[MatchRun]:
+    """Atomically move the oldest queued (or stale running) run to 'running' under a new claim token."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=MATCH_STALE_SECONDS)
+    stmt = (
+        select(MatchRun)
+        .where(or_(
+            MatchRun.status == "queued",
+            and_(MatchRun.status == "running", MatchRun.heartbeat_at < stale),
+        ))
+        .order_by(MatchRun.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    run = db.execute(stmt).scalars().first()
+    if run is None:
+        db.rollback()
+        return None
+    run.status = "running"
+    run.started_at = now
+    run.heartbeat_at = now
+    run.processed = 0
+    run.error = None
+    run.claim_token = new_claim_token()
+    db.commit()
+    return run
+
+class Heartbeat:
+    """
+    Keeps a claimed run's heartbeat_at fresh from a timer thread while it
+    executes, so one long step (pool start-up, model load, ranking a huge run)
+    does not make it look stale. `check` is called before the executor commits:
+    it raises ClaimLost once another worker holds the run.
+    """
+
+    def __init__(self, run_id, token: str, interval: float = MATCH_HEARTBEAT_SECONDS):
+        self.run_id = run_id
+        self.token = token
+        self.interval = interval
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "Heartbeat":
+        self._thread = threading.Thread(target=self._loop, name="match-run-heartbeat", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                with SessionLocal() as db:
+                    owned = db.execute(
+                        update(MatchRun)
+                        .where(MatchRun.id == self.run_id, MatchRun.claim_token == self.token)
+                        .values(heartbeat_at=datetime.utcnow())
+                    ).rowcount
+                    db.commit()
+            except Exception:
+                log.exception("heartbeat of match run %s failed", self.run_id)
+                continue
+            if not owned:
+                self.lost.set()
+                return
+
+    def check(self, db: Session) -> None:
+        """Raise ClaimLost unless the run still carries our token (row-locked until the caller commits)."""
+        if not self.lost.is_set():
+            owner = db.execute(
+                select(MatchRun.claim_token).where(MatchRun.id == self.run_id).with_for_update()
+            ).scalar()
+            if owner == self.token:
+                return
+            self.lost.set()
+        raise ClaimLost(f"match run {self.run_id} was claimed by another worker")
+
+# -------- match_score persistence --------
+REUSE_BATCH = 1000
+
+def _score_rows(run_id, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{
+        "run_id": run_id,
+        "candidate_id": UUID(r["candidate_id"]),
+        "total_score": r["total_score"],
+        "subscores": r["subscores"],
+        "hard_blockers": r["hard_blockers"],
+        "cv_hash": r.get("cv_hash"),
+        "stage": r.get("stage"),
+    } for r in results]
+
+def _lightweight_rows(run_id, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Candidates pruned by a keep_top run: no score and no cv_hash, so later runs rescore them."""
+    return [{"run_id": run_id, "candidate_id": UUID(r["candidate_id"])} for r in results]
+
+def _copy_scores(db: Session, src_run_id, dst_run_id, candidate_ids: List) -> None:
+    """INSERT ... SELECT rows of unchanged candidates from a previous run (no JSON round trip)."""
+    run_id = literal(dst_run_id, MatchScore.run_id.type)
+    for i in range(0, len(candidate_ids), REUSE_BATCH):
+        batch = candidate_ids[i:i + REUSE_BATCH]
+        src = select(
+            run_id, MatchScore.candidate_id, MatchScore.total_score, MatchScore.subscores,
+            MatchScore.hard_blockers, MatchScore.suggestions, MatchScore.cv_hash, MatchScore.stage,
+        ).where(MatchScore.run_id == src_run_id, MatchScore.candidate_id.in_(batch))
+        db.execute(insert(MatchScore).from_select(
+            ["run_id", "candidate_id", "total_score", "subscores", "hard_blockers", "suggestions", "cv_hash", "stage"],
+            src,
+        ))
+
+def _assign_ranks(db: Session, run_id) -> int:
+    """Rank every scored row of the run by score (candidate id breaks ties); returns the row count."""
+    ids = db.execute(
+        select(MatchScore.candidate_id)
+        .where(MatchScore.run_id == run_id, MatchScore.total_score.isnot(None))
+        .order_by(MatchScore.total_score.desc(), MatchScore.candidate_id)
+    ).scalars().all()
+    if ids:
+        db.execute(update(MatchScore), [
+            {"run_id": run_id, "candidate_id": cid, "rank": i} for i, cid in enumerate(ids, start=1)
+        ])
+    return len(ids)
+
+def _rescore_survivors(db: Session, reader: Session, run: MatchRun, profile: JobProfile,
+                       versions: Dict[str, str], top: Optional[TopK], timer: Optional[StageTimer],
+                       counts: Dict[str, int], beat: Heartbeat, relevance: Dict[str, float]) -> None:
+    """
+    Second cascade pass: pick the survivors among this run's lexical rows and
+    overwrite their scores with semantic ones. A survivor pruned by `top` loses
+    its lexical score and becomes a lightweight row, as in a keep_top run:
+    its lexical score may be above the K-th semantic one. The survivors are added to `run.total` and counted in
+    `run.processed` as they are rescored, so /status and its ETA cover this pass.
+    """
+    with stage(timer, "cascade"):
+        lexical = db.execute(
+            select(MatchScore.candidate_id, MatchScore.total_score)
+            .where(MatchScore.run_id == run.id, MatchScore.stage == "lexical")
+        ).all()
+        survivors = cascade_survivors(lexical, run.cascade_threshold, run.cascade_share)
+    counts["survivors"] = len(survivors)
+    counts["rescored"] = 0
+    processed = run.processed
+    run.total += len(survivors)
+    _heartbeat(db, run, processed, beat)
+    last_flush = time.monotonic()
+    rows = iter_candidate_cvs(reader, candidate_ids=survivors, known_relevance=relevance)
+    if timer is not None:
+        rows = timer.timed_iter("load", rows)
+    for chunk in iter_scored_chunks(profile, rows, workers=run.workers, timer=timer, top=top, relevance=relevance):
+        with stage(timer, "persist"):
+            scored = [r for r in chunk if r["total_score"] is not None]
+            pruned = [r for r in chunk if r["total_score"] is None]
+            for r in scored:
+                r["cv_hash"] = versions.get(r["candidate_id"])
+            if scored:
+                db.execute(update(MatchScore), _score_rows(run.id, scored))
+            if pruned:
+                db.execute(update(MatchScore), [
+                    {**row, "total_score": None, "subscores": None, "hard_blockers": None, "stage": None}
+                    for row in _lightweight_rows(run.id, pruned)
+                ])
+                counts["pruned"] += len(pruned)
+            counts["rescored"] += len(scored)
+            processed += len(chunk)
+            if time.monotonic() - last_flush >= MATCH_PROGRESS_SECONDS:
+                _heartbeat(db, run, processed, beat)
+                last_flush = time.monotonic()
+    run.processed = processed
+
+def _heartbeat(db: Session, run: MatchRun, processed: int, beat: Heartbeat) -> None:
+    """Commit progress (and everything persisted since the last commit) if we still own the run."""
+    beat.check(db)
+    run.processed = processed
+    run.heartbeat_at = datetime.utcnow()
+    db.commit()
+
+# -------- run statistics --------
+def _cache_counts() -> Dict[str, int]:
+    cache = backend_stats().get("cache") or {}
+    return {k: cache.get(k, 0) for k in ("hits", "disk_hits", "misses")}
+
+def _count_stored(rows: Iterator[CandidateRow], counts: Dict[str, int]) -> Iterator[CandidateRow]:
+    for row in rows:
+        counts["stored_features" if row[3] is not None else "computed_features"] += 1
+        yield row
+
+def run_stats(timer: StageTimer, started: float, counts: Dict[str, int], cache_before: Dict[str, int],
+              run: MatchRun) -> Dict[str, Any]:
+    """Summary stored on MatchRun.stats_json; stage seconds are also fed to the metrics histogram."""
+    cache_after = _cache_counts()
+    stages = timer.summary()
+    for name, s in stages.items():
+        RUN_STAGE_SECONDS.observe(s["seconds"], name)
+    seconds = time.perf_counter() - started
+    RUN_STAGE_SECONDS.observe(seconds, "total")
+    return {
+        "seconds": round(seconds, 6),
+        "stages": stages,  # "score" / "subscores.*" are summed over pool workers
+        "candidates": (run.total or 0) - counts.get("survivors", 0),  # total includes the cascade's second pass
+        "reused": run.reused or 0,
+        "scored": counts["stored_features"] + counts["computed_features"] - counts["pruned"],
+        **counts,
+        "workers": run.workers,
+        "embedding_cache": {k: cache_after[k] - cache_before.get(k, 0) for k in cache_after},  # this process only
+    }
+
+def execute_run(run_id, token: Optional[str] = None) -> None:
+    """
+    Score every candidate for a run claimed under `token`; rows land in
+    match_score as chunks finish. Without a token (a run created as 'running'
+    by its caller) the row's token is used, or a new one is written.
+    """
+    with SessionLocal() as db, SessionLocal() as reader:
+        run = db.get(MatchRun, run_id)
+        if run is None:
+            return
+        if token is None:
+            token = run.claim_token or new_claim_token()
+            run.claim_token = token
+            db.commit()
+        timer = new_timer()
+        started = time.perf_counter()
+        counts = {"stored_features": 0, "computed_features": 0, "pruned": 0}
+        cache_before = _cache_counts() if timer is not None else {}
+        with Heartbeat(run.id, token) as beat:
+            try:
+                job = db.get(Job, run.job_id)
+                if job is None:
+                    raise LookupError("Job not found")
+                # a re-claimed (stale) run starts over
+                db.execute(delete(MatchScore).where(MatchScore.run_id == run.id))
+                with stage(timer, "compile_job"):
+                    profile = compile_job(job_to_scoring_dict(job))
+                # skill-index pre-filter: skip CVs that mention too few required skills
+                pool = None
+                if run.min_skills and profile.required:
+                    pool = candidates_covering(profile.required, run.min_skills)
+                with stage(timer, "versions"):
+                    versions = candidate_cv_versions(reader, pool)
+                # ANN stage one: keep only the top_k CVs nearest to the JD summary
+                if run.top_k and profile.summary_vec is not None and len(versions) > run.top_k:
+                    with stage(timer, "retrieval"):
+                        keep = retrieve_candidates(reader, profile.summary_vec, run.top_k, list(versions))
+                    versions = {c: versions[c] for c in keep}
+                    pool = [UUID(c) for c in keep]
+                run.jd_hash = scoring_key(profile)
+                run.total = len(versions)
+                # role relevance of every CV in the vector store: one pass over the mapped matrix
+                relevance: Dict[str, float] = {}
+                if profile.semantic and profile.summary_vec is not None:
+                    with stage(timer, "relevance"):
+                        relevance = summary_relevance(reader, profile.summary_vec, versions)
+
+                # incremental: carry over rows whose CV is unchanged since the previous run
+                todo = None
+                prev = latest_reusable_run(db, run) if run.incremental else None
+                if prev is not None:
+                    with stage(timer, "reuse"):
+                        prev_hashes = db.execute(
+                            select(MatchScore.candidate_id, MatchScore.cv_hash).where(MatchScore.run_id == prev.id)
+                        ).all()
+                        reused = [cid for cid, h in prev_hashes if h and versions.get(str(cid)) == h]
+                        _copy_scores(db, prev.id, run.id, reused)
+                    run.reused = len(reused)
+                    done = {str(cid) for cid in reused}
+                    todo = [UUID(c) for c in versions if c not in done]
+                processed = run.reused or 0
+                _heartbeat(db, run, processed, beat)
+
+                # top-K mode: the heap starts from the reused scores, so pruning can start right away
+                top = None
+                if run.keep_top:
+                    top = TopK(run.keep_top, db.execute(
+                        select(MatchScore.total_score)
+                        .where(MatchScore.run_id == run.id, MatchScore.total_score.isnot(None))
+                    ).scalars())
+
+                # cascade: a lexical pass over everyone first, the semantic pass only for the survivors
+                cascade = (run.cascade_threshold is not None or bool(run.cascade_share)) and profile.semantic
+
+                last_flush = time.monotonic()
+                rows = iter_candidate_cvs(reader, candidate_ids=todo, candidate_filter=pool if todo is None else None,
+                                          known_relevance=relevance)
+                if timer is not None:
+                    # DB fetch + stored-feature decoding, pulled lazily by the scorer
+                    rows = timer.timed_iter("load", _count_stored(rows, counts))
+                for chunk in iter_scored_chunks(profile, rows, workers=run.workers, timer=timer,
+                                                top=None if cascade else top, lexical=cascade, relevance=relevance):
+                    with stage(timer, "persist"):
+                        scored = [r for r in chunk if r["total_score"] is not None]
+                        pruned = [r for r in chunk if r["total_score"] is None]
+                        for r in scored:
+                            # cascade rows get their cv_hash with the semantic score: incremental runs reuse final scores only
+                            r["cv_hash"] = None if cascade else versions.get(r["candidate_id"])
+                        if scored:
+                            db.execute(insert(MatchScore), _score_rows(run.id, scored))
+                        if pruned:
+                            db.execute(insert(MatchScore), _lightweight_rows(run.id, pruned))
+                            counts["pruned"] += len(pruned)
+                        processed += len(chunk)
+                        if time.monotonic() - last_flush >= MATCH_PROGRESS_SECONDS:
+                            _heartbeat(db, run, processed, beat)
+                            last_flush = time.monotonic()
+                run.processed = processed
+                if cascade:
+                    _rescore_survivors(db, reader, run, profile, versions, top, timer, counts, beat, relevance)
+
+                with stage(timer, "rank"):
+                    _assign_ranks(db, run.id)
+                    beat.check(db)
+                    run.status = "done"
+                    run.finished_at = datetime.utcnow()
+                    db.commit()
+                if timer is not None:
+                    run.stats_json = run_stats(timer, started, counts, cache_before, run)
+                    db.commit()
+            except ClaimLost:
+                # the new owner starts the run over; nothing of ours was committed since our last check
+                log.warning("match run %s was claimed by another worker; stopping", run_id)
+                db.rollback()
+            except Exception as e:
+                log.exception("match run %s failed", run_id)
+                db.rollback()
+                try:
+                    beat.check(db)
+                except ClaimLost:
+                    db.rollback()
+                    return
+                run.status = "failed"
+                run.error = str(e)[:2000]
+                run.finished_at = datetime.utcnow()
+                db.commit()  # the failure is recorded before anything else can go wrong
+                if timer is not None:
+                    try:
+                        run.stats_json = run_stats(timer, started, counts, cache_before, run)
+                        db.commit()
+                    except Exception:
+                        log.exception("match run %s: could not store stats", run_id)
+                        db.rollback()
+
+# -------- lazy suggestions --------
+def ensure_suggestions(db: Session, run: MatchRun, scores: List[MatchScore]) -> None:
+    """
+    Fill `suggestions` for the given rows of a run on first read. The match_score
+    row is the memo (keyed by run + candidate), so each pair is computed once;
+    incremental runs copy it along with the score. Caller commits.
+    """
+    missing = {s.candidate_id: s for s in scores if s.suggestions is None}
+    if not missing:
+        return
+    job = db.get(Job, run.job_id)
+    if job is None:
+        return
+    started = time.perf_counter()
+    profile = compile_job(job_to_scoring_dict(job))
+    for cand_id, _label, cv_text, feats in iter_candidate_cvs(db, candidate_ids=list(missing)):
+        row = missing.pop(cand_id)
+        subs = Subscores(**(row.subscores or {}))
+        sugg = suggest_improvements(profile, cv_text, subs, list(row.hard_blockers or []), feats)
+        sugg.pop("delta_to_top5", None)  # depends on the whole run; filled at read time
+        row.suggestions = sugg
+    for row in missing.values():  # CV text no longer available
+        row.suggestions = {}
+    SUGGESTIONS_LATENCY.observe(time.perf_counter() - started)
+
+def run_progress(run: MatchRun) -> Dict[str, Any]:
+    """Status payload for a run, including a linear ETA while it is running."""
+    processed = run.processed or 0
+    total = run.total
+    eta = None
+    scored = processed - (run.reused or 0)  # reused rows cost nothing, keep them out of the rate
+    if run.status == "running" and run.started_at and total and scored > 0:
+        elapsed = (datetime.utcnow() - run.started_at).total_seconds()
+        eta = round(elapsed / scored * max(0, total - processed), 1)
+    return {
+        "id": str(run.id),
+        "job_id": str(run.job_id),
+        "status": run.status,
+        "processed": processed,
+        "total": total,
+        "reused": run.reused or 0,
+        "progress": round(processed / total, 4) if total else (1.0 if run.status == "done" else 0.0),
+        "eta_seconds": eta,
+        "error": run.error,
+        "stats": run.stats_json,
+        "created_at": run.created_at,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+    }
+
+# -------- background worker --------
+class MatchRunWorker:
+    """Polls the match_run table and executes queued runs one at a time."""
+
+    def __init__(self, poll_seconds: float = MATCH_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._compact_checked = time.monotonic()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="match-run-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def notify(self) -> None:
+        """Wake the worker now instead of at the next poll."""
+        self._wake.set()
+
+    def run_pending(self) -> int:
+        """Execute queued runs until none is left; returns how many ran."""
+        n = 0
+        while not self._stop.is_set():
+            with SessionLocal() as db:
+                run = claim_next_run(db)
+                run_id = run.id if run else None
+                token = run.claim_token if run else None
+            if run_id is None:
+                return n
+            execute_run(run_id, token)
+            n += 1
+        return n
+
+    def compact_vectors(self) -> None:
+        """Compact the vector store between runs, at most every VECTOR_COMPACT_SECONDS."""
+        if time.monotonic() - self._compact_checked < VECTOR_COMPACT_SECONDS:
+            return
+        self._compact_checked = time.monotonic()
+        with SessionLocal() as db:
+            kept = compact_if_fragmented(db)
+        if kept is not None:
+            log.info("compacted the vector store to %d row(s)", kept)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+                self.compact_vectors()
+            except Exception:
+                log.exception("match run worker error")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+worker = MatchRunWorker()
+
+if __name__ == "__main__":
+    # dedicated worker process: `python -m app.runs` (set MATCH_BACKGROUND=0 on the API)
+    logging.basicConfig(level=logging.INFO)
+    worker._loop()
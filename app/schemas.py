@@ -51,6 +51,19 @@ class DocumentOut(BaseModel):
     class Config:
         from_attributes = True
 
+class BatchItemOut(BaseModel):
+    filename: str
+    label: Optional[str] = None
+    status: str                      # "ok" | "error"
+    candidate_id: Optional[UUID] = None
+    document_id: Optional[UUID] = None
+    error: Optional[str] = None
+
+class BatchIngestOut(BaseModel):
+    created: int
+    failed: int
+    results: List[BatchItemOut]
+
 class MatchRunOut(BaseModel):
     id: UUID
     job_id: UUID
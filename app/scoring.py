@@ -1,40 +1,43 @@
 # app/scoring.py
-from dataclasses import dataclass
-from typing import List, Dict, Tuple, Optional
-import os
+from dataclasses import dataclass, field, replace
+from typing import Any, List, Dict, Tuple, Optional, FrozenSet, Sequence, Union
+from collections import Counter, OrderedDict
+import hashlib
+import json
 import re
+import threading
+
+from .embeddings import embed as _backend_embed, get_backend
 
 # -------- Optional semantic embeddings (auto-fallback if not available) --------
-_MODEL = None
-_USE_EMBEDDINGS = True
-try:
-    use_env = os.getenv("AI_EMBEDDINGS", "auto").lower()
-    if use_env in ("0", "false", "off"):
-        raise ImportError("Embeddings disabled via AI_EMBEDDINGS")
-    from sentence_transformers import SentenceTransformer, util  # type: ignore
-    _MODEL = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-except Exception:
-    _USE_EMBEDDINGS = False
-    _MODEL = None
+# The backend (MiniLM / ONNX / hashing / none) is chosen by env and loaded on first use;
+# see app/embeddings.py.
+def _embeddings_on() -> bool:
+    return get_backend() is not None
 
 def _embed(texts: List[str]):
-    if _MODEL is None:
-        return None
-    return _MODEL.encode(texts, normalize_embeddings=True)
+    return _backend_embed(texts)
+
+def embedding_model_id() -> Optional[str]:
+    """Identifier of the active embedding backend (None when embeddings are off)."""
+    backend = get_backend()
+    return backend.name if backend is not None else None
 
 def _cosine(a, b) -> float:
-    if a is None or b is None or _MODEL is None:
+    if a is None or b is None:
         return 0.0
-    # sentence-transformers util is fastest if present
     try:
-        from sentence_transformers import util  # type: ignore
         import numpy as np  # type: ignore
-        va = a.reshape(1, -1) if hasattr(a, "reshape") else np.array(a).reshape(1, -1)
-        vb = b.reshape(1, -1) if hasattr(b, "reshape") else np.array(b).reshape(1, -1)
-        return float(util.cos_sim(va, vb)[0][0])
+        va = np.asarray(a, dtype=np.float32).reshape(-1)
+        vb = np.asarray(b, dtype=np.float32).reshape(-1)
+        denom = float(np.linalg.norm(va) * np.linalg.norm(vb))
+        return float(va @ vb) / denom if denom else 0.0
     except Exception:
         return 0.0
 
+# Bump when tokenization or scoring rules change (match runs only reuse scores of the same version)
+SCORING_VERSION = 3
+
 # -------- Weights and score container (kept compatible) --------
 WEIGHTS = {
     "req_skills": 0.40,          # ↑ a bit: we care more about requirements
@@ -90,31 +93,111 @@ SYNONYMS = {
     "node": "node.js",
     "ci/cd": "ci-cd",
     "machine-learning": "ml",
+    "machine learning": "ml",
     "nlp": "natural language processing",
+    "node js": "node.js",
 }
 
+# multi-word skills recognised as one token (besides the multi-word SYNONYMS keys)
+SKILL_PHRASES = (
+    "power bi", "microsoft 365", "natural language processing", "deep learning",
+    "computer vision", "data science", "google cloud", "sql server", "spring boot",
+    "react native", "project management", "unit testing",
+)
+
 def _norm_token(t: str) -> str:
     s = t.strip().lower()
     s = SYNONYMS.get(s, s)
     return s
 
-def extract_tokens(text: str) -> List[str]:
-    toks = []
-    for m in SKILL_TOKEN.findall(text or ""):
-        s = _norm_token(m)
-        if len(s) < 2: 
+# -------- Multi-word skill matcher --------
+# Phrases are grouped by their first word: a CV only pays for phrase matching when
+# one of those words occurs in it, and then one compiled alternation per such word
+# (literal prefix, so the regex engine skips ahead) finds every occurrence.
+_TOKEN_CHARS = "A-Za-z0-9+.#/-"
+_PHRASE_TAIL = rf"(?![A-Za-z0-9+#/-]|\.[{_TOKEN_CHARS}])"  # may end in sentence punctuation
+
+def _compile_phrases(phrases: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """({"power bi": canonical, ...}, {first word: pattern}) for multi-word phrases."""
+    canonical: Dict[str, str] = {}
+    by_root: Dict[str, List[List[str]]] = {}
+    for phrase, canon in phrases.items():
+        words = phrase.lower().split()
+        if len(words) < 2:
             continue
-        if s in STOP:
+        canonical[" ".join(words)] = canon
+        by_root.setdefault(words[0], []).append(words)
+    patterns = {}
+    for root, options in by_root.items():
+        options.sort(key=len, reverse=True)  # longest phrase wins
+        alt = "|".join(r"[ \t]+".join(re.escape(w) for w in ws) for ws in options)
+        patterns[root] = re.compile(rf"(?:{alt}){_PHRASE_TAIL}")
+    return canonical, patterns
+
+PHRASES, PHRASE_PATTERNS = _compile_phrases({
+    **{p: p for p in SKILL_PHRASES},
+    **{k: v for k, v in SYNONYMS.items() if " " in k},
+    **{v: v for v in SYNONYMS.values() if " " in v},
+})
+_BEFORE_TOKEN = re.compile(rf"[{_TOKEN_CHARS}]")
+
+def _phrase_matches(low: str, roots) -> List[Tuple[str, int, int]]:
+    """(canonical form, start, end) of the dictionary phrases in lowercased text, starting at any of `roots`."""
+    out = []
+    for root in roots:
+        for m in PHRASE_PATTERNS[root].finditer(low):
+            if m.start() and _BEFORE_TOKEN.match(low, m.start() - 1):
+                continue  # root is the tail of a longer word
+            out.append((PHRASES[" ".join(m.group().split())], m.start(), m.end()))
+    return out
+
+def _skill_tokens(text: str) -> Dict[str, None]:
+    """
+    Distinct normalized skill tokens in text order (an ordered dict as a set),
+    multi-word skills last. A phrase replaces its words: "power bi" yields
+    "power bi" alone, unless "power" or "bi" also occurs outside a phrase.
+    """
+    text = text or ""
+    out: Dict[str, None] = {}
+    seen = set()
+    roots = set()
+    found = SKILL_TOKEN.findall(text)
+    for m in found:
+        if m in seen:  # normalize each distinct spelling once
             continue
-        toks.append(s)
-    # de-dup but keep order
-    seen, out = set(), []
-    for t in toks:
-        if t not in seen:
-            seen.add(t)
-            out.append(t)
+        seen.add(m)
+        low = m.lower()
+        if low in PHRASE_PATTERNS:
+            roots.add(low)
+        t = _norm_token(m)
+        if len(t) >= 2 and t not in STOP:
+            out[t] = None
+    if not roots:
+        return out
+    low = text.lower()
+    matches = _phrase_matches(low, sorted(roots))
+    if matches:
+        # word tokens inside a phrase (the last may run on into punctuation, e.g. "bi.")
+        consumed: Counter = Counter()
+        for _, start, end in matches:
+            for w in SKILL_TOKEN.finditer(low, start):
+                if w.start() >= end:
+                    break
+                consumed[_norm_token(w.group())] += 1
+        occurrences: Counter = Counter()
+        for m, n in Counter(found).items():
+            occurrences[_norm_token(m)] += n
+        for t, n in consumed.items():
+            if occurrences[t] <= n:
+                out.pop(t, None)
+    for t, _, _ in matches:
+        if t not in STOP:
+            out[t] = None
     return out
 
+def extract_tokens(text: str) -> List[str]:
+    return list(_skill_tokens(text))
+
 def extract_bullets(text: str) -> List[str]:
     # split by bullet markers, keep lines that look like items
     lines = [l.strip() for l in (text or "").splitlines()]
@@ -142,36 +225,6 @@ def extract_bullets(text: str) -> List[str]:
     # filter very short noise
     return [b for b in out if len(b) >= 4]
 
-def _semantic_contains(cv_tokens: List[str], req: str, embs_cache: Dict[str, any]) -> bool:
-    """Return True if CV appears to cover `req` token semantically."""
-    req_n = _norm_token(req)
-    if req_n in cv_tokens:
-        return True
-    if not _USE_EMBEDDINGS:
-        return False
-    # semantic check via embeddings (threshold tuned for MiniLM)
-    # cache embeddings per token to avoid recompute
-    if "cv_vecs" not in embs_cache:
-        embs_cache["cv_vecs"] = _embed(cv_tokens) if cv_tokens else None
-    if "req_vecs" not in embs_cache:
-        embs_cache["req_vecs"] = {}
-    if req_n not in embs_cache["req_vecs"]:
-        embs_cache["req_vecs"][req_n] = _embed([req_n])[0] if _embed([req_n]) is not None else None
-    q = embs_cache["req_vecs"][req_n]
-    V = embs_cache["cv_vecs"]
-    if q is None or V is None:
-        return False
-    # compute best cosine vs each cv token
-    try:
-        from sentence_transformers import util  # type: ignore
-        import numpy as np  # type: ignore
-        qv = q.reshape(1, -1) if hasattr(q, "reshape") else np.array(q).reshape(1, -1)
-        sims = util.cos_sim(qv, V)[0]
-        best = float(sims.max()) if hasattr(sims, "max") else 0.0
-        return best >= 0.60
-    except Exception:
-        return False
-
 def _jd_requirements(jd_text: str) -> Dict[str, List[str]]:
     """Extract required vs preferred-ish tokens from a JD text."""
     text = jd_text or ""
@@ -218,82 +271,341 @@ def _jd_requirements(jd_text: str) -> Dict[str, List[str]]:
 
     return {"required": req_sorted, "preferred": pref_sorted}
 
-# -------- Main scoring functions (public API stays compatible) --------
-def compute_subscores(jd: dict, cv_text: str) -> Tuple[Subscores, List[str]]:
+# -------- Per-CV derived features (cacheable per document) --------
+# keyword signals (checked in order, first seniority hit wins)
+SENIORITY = (
+    ("senior", re.compile(r"\b(senior|lead|staff|principal)\b")),
+    ("mid", re.compile(r"\b(mid|intermediate)\b")),
+    ("junior", re.compile(r"\b(junior|entry)\b")),
+)
+SENIORITY_SCORES = {"senior": 0.8, "mid": 0.6, "junior": 0.4}
+EDUCATION = re.compile(r"\b(msc|bsc|phd|master|bachelor|degree|licence|licentiate)\b")
+LANGUAGES = re.compile(r"\b(english|french|german|spanish|arabic|portuguese|italian|dutch)\b")
+
+@dataclass
+class CVFeatures:
+    """Everything scoring derives from the CV text alone; safe to persist and reuse."""
+    tokens: List[str]
+    bullets: List[str]
+    summary_vec: Any = None   # embedding of cv_text[:4000]
+    token_vecs: Any = None    # len(tokens) x dim embedding matrix
+    quantified: List[bool] = field(default_factory=list)  # per bullet: mentions a number / percentage
+    seniority: Optional[str] = None  # highest of senior / mid / junior mentioned
+    education: bool = False
+    languages: bool = False
+
+    def signals(self) -> Dict[str, Any]:
+        """The scalar signals, as stored next to tokens/bullets."""
+        return {"quantified": self.quantified, "seniority": self.seniority,
+                "education": self.education, "languages": self.languages}
+
+def scan_cv(cv_text: str) -> CVFeatures:
     """
-    jd: expects keys 'title', 'jd_text', 'jd_required_skills' (optional), 'jd_preferred_skills' (optional)
+    Tokens, bullets and keyword signals for a CV in one call, so compute_subscores
+    and suggest_improvements share one result instead of rescanning the text
+    (same values as extract_tokens / extract_bullets and the keyword regexes).
     """
-    subs = Subscores()
-    hard_blockers: List[str] = []
-    embs_cache: Dict[str, any] = {}
+    text = cv_text or ""
+    tokens = _skill_tokens(text)
+
+    # bullet grouping, as in extract_bullets; continuation lines collect in lists
+    out: List[List[str]] = []
+    cur: List[str] = []
+    for raw in text.splitlines():
+        ln = raw.strip()
+        m = BULLET.match(ln) if ln else None
+        if m:
+            if cur:
+                out.append([" ".join(cur).strip()])
+                cur = []
+            out.append([ln[m.end():]])
+        elif ln.endswith(":"):
+            # section header – start fresh
+            if cur:
+                out.append([" ".join(cur).strip()])
+                cur = []
+        elif out and ln:
+            out[-1].append(ln)
+        else:
+            cur.append(ln)
+    if cur:
+        out.append([" ".join(cur).strip()])
+    bullets = [b for b in (" ".join(parts).strip() for parts in out) if len(b) >= 4]
+    low = text.lower()
+    return CVFeatures(
+        tokens=list(tokens),
+        bullets=bullets,
+        quantified=[bool(HAS_NUMBER.search(b)) for b in bullets],
+        seniority=next((lvl for lvl, pat in SENIORITY if pat.search(low)), None),
+        education=bool(EDUCATION.search(low)),
+        languages=bool(LANGUAGES.search(low)),
+    )
+
+def extract_cv_features(cv_text: str, embed: bool = True) -> CVFeatures:
+    text = cv_text or ""
+    feats = scan_cv(text)
+    if embed and _embeddings_on():
+        # one batch: summary first, then every token
+        V = _embed([text[:4000], *feats.tokens])
+        if V is not None:
+            feats.summary_vec = V[0]
+            feats.token_vecs = V[1:] if feats.tokens else None
+    return feats
+
+# -------- Compiled job profile (built once per run / job version) --------
+@dataclass(frozen=True)
+class JobProfile:
+    """
+    Immutable, pre-parsed view of a job. Build it with `compile_job` and pass it
+    to `compute_subscores` / `suggest_improvements` instead of the raw jd dict so
+    the JD is parsed and embedded once, not once per candidate.
+    """
+    fingerprint: str
+    title: str
+    jd_text: str
+    required: Tuple[str, ...]
+    preferred: Tuple[str, ...]
+    mandatory_certs: Tuple[str, ...]
+    parsed_required: Tuple[str, ...]      # requirements parsed from jd_text (used by suggestions)
+    token_set: FrozenSet[str]             # title + JD tokens for the Jaccard fallback
+    summary_vec: Any = None               # embedding of the JD summary (None without embeddings)
+    terms: Tuple[str, ...] = ()           # distinct normalized requirement terms, row order of term_vecs
+    term_vecs: Any = None                 # len(terms) x dim embedding matrix (None without embeddings)
+    term_index: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def semantic(self) -> bool:
+        """True when scoring this job does embedding work (a lexical cascade pass differs from full scoring)."""
+        return _embeddings_on() and (self.summary_vec is not None or self.term_vecs is not None)
+
+_PROFILE_CACHE: "OrderedDict[str, JobProfile]" = OrderedDict()
+_PROFILE_CACHE_MAX = 64
+_PROFILE_LOCK = threading.Lock()  # shared by the match worker, request threads and best-jobs
+
+def _jd_fingerprint(jd: dict) -> str:
+    keys = ("title", "jd_text", "jd_required_skills", "jd_preferred_skills", "mandatory_certs")
+    payload = json.dumps([jd.get(k) or None for k in keys], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def compile_job(jd: dict, remember: bool = True) -> JobProfile:
+    """
+    jd: same keys as `compute_subscores`. Profiles are memoized per job version
+    (content fingerprint), so recompiling an unchanged job is a dict lookup.
+    `remember=False` still reads the cache but leaves it untouched (one-off
+    sweeps over every job must not evict the profiles match runs rely on).
+    """
+    fp = _jd_fingerprint(jd)
+    with _PROFILE_LOCK:
+        cached = _PROFILE_CACHE.get(fp)
+        if cached is not None and remember:
+            _PROFILE_CACHE.move_to_end(fp)
+    if cached is not None:
+        return cached
 
     jd_text = (jd.get("jd_text") or "").strip()
     title = (jd.get("title") or "").strip()
 
     # Extract JD requirements (prefer explicit lists if present, else parse from JD text)
+    parsed = _jd_requirements(jd_text)
     jd_req = [(s or "").strip().lower() for s in (jd.get("jd_required_skills") or []) if s]
     jd_pref = [(s or "").strip().lower() for s in (jd.get("jd_preferred_skills") or []) if s]
     if not jd_req and jd_text:
-        parsed = _jd_requirements(jd_text)
         jd_req = parsed["required"]
         jd_pref = jd_pref or parsed["preferred"]
+    certs = [c for c in (jd.get("mandatory_certs") or []) if c]
 
-    # CV tokens + bullets
-    cv_tokens = extract_tokens(cv_text or "")
-    bullets = extract_bullets(cv_text or "")
+    terms = tuple(dict.fromkeys(
+        _norm_token(t) for t in (*jd_req, *jd_pref, *certs, *parsed["required"])
+    ))
+    summary_vec, term_vecs = None, None
+    if _embeddings_on():
+        jd_sum = (title + ". " if title else "") + (jd_text[:1200] if jd_text else "")
+        V = _embed([jd_sum, *terms])
+        if V is not None:
+            summary_vec, term_vecs = V[0], (V[1:] if terms else None)
+
+    profile = JobProfile(
+        fingerprint=fp,
+        title=title,
+        jd_text=jd_text,
+        required=tuple(jd_req),
+        preferred=tuple(jd_pref),
+        mandatory_certs=tuple(certs),
+        parsed_required=tuple(parsed["required"]),
+        token_set=frozenset(extract_tokens(title + " " + jd_text)),
+        summary_vec=summary_vec,
+        terms=terms,
+        term_vecs=term_vecs,
+        term_index={t: i for i, t in enumerate(terms)},
+    )
+    if remember:
+        with _PROFILE_LOCK:
+            _PROFILE_CACHE[fp] = profile
+            if len(_PROFILE_CACHE) > _PROFILE_CACHE_MAX:
+                _PROFILE_CACHE.popitem(last=False)
+    return profile
 
-    # --- req/pref coverage with semantic fallback ---
-    if jd_req:
-        covered = sum(1 for r in jd_req if _semantic_contains(cv_tokens, r, embs_cache))
-        subs.req_skills = covered / max(1, len(jd_req))
-    if jd_pref:
-        covered = sum(1 for p in jd_pref if _semantic_contains(cv_tokens, p, embs_cache))
-        subs.pref_skills = covered / max(1, len(jd_pref))
+def _as_profile(jd: Union[dict, JobProfile], remember: bool = True) -> JobProfile:
+    return jd if isinstance(jd, JobProfile) else compile_job(jd, remember)
 
-    # --- role relevance (semantic JD summary vs CV) ---
-    if _USE_EMBEDDINGS and _MODEL is not None:
-        jd_sum = (title + ". " if title else "") + (jd_text[:1200] if jd_text else "")
-        V = _embed([jd_sum, cv_text[:4000]])
-        subs.role_relevance = _cosine(V[0], V[1])
-    else:
-        # cheap fallback: jaccard over tokens
-        def jaccard(a: List[str], b: List[str]) -> float:
-            A, B = set(a), set(b)
-            return len(A & B) / len(A | B) if A and B else 0.0
-        subs.role_relevance = jaccard(extract_tokens(title + " " + jd_text), cv_tokens)
-
-    # --- experience level heuristic ---
-    cv_low = (cv_text or "").lower()
-    if re.search(r"\b(senior|lead|staff|principal)\b", cv_low):
-        subs.experience_level = 0.8
-    elif re.search(r"\b(mid|intermediate)\b", cv_low):
-        subs.experience_level = 0.6
-    elif re.search(r"\b(junior|entry)\b", cv_low):
-        subs.experience_level = 0.4
-    else:
-        subs.experience_level = 0.5
+# -------- Vectorized skill coverage --------
+SEMANTIC_THRESHOLD = 0.60  # cosine, tuned for MiniLM
 
-    # --- achievement density: how many bullets have numbers/impact ---
-    if bullets:
-        num_bullets = len(bullets)
-        quantified = sum(1 for b in bullets if HAS_NUMBER.search(b))
-        subs.achievement_density = min(1.0, quantified / max(1, num_bullets))
+@dataclass
+class Coverage:
+    """Covered flags per requirement list of a `JobProfile`, in list order."""
+    required: List[bool]
+    preferred: List[bool]
+    certs: List[bool]
+    parsed_required: List[bool]
+
+def skill_coverage(profile: JobProfile, cv_tokens: List[str], cv_vecs=None, semantic: bool = True) -> Coverage:
+    """
+    Decide coverage for every requirement term of the job in one pass: exact
+    token hits first, then a single terms x cv_tokens similarity matmul for the
+    rest. `cv_vecs` may carry precomputed (normalized) CV token embeddings;
+    `semantic=False` stops after the exact hits.
+    """
+    cv_set = set(cv_tokens)
+    covered = [t in cv_set for t in profile.terms]
+
+    if (semantic and profile.term_vecs is not None and cv_tokens and _embeddings_on()
+            and not all(covered)):
+        try:
+            import numpy as np  # type: ignore
+            if cv_vecs is None:
+                cv_vecs = _embed(cv_tokens)
+            if cv_vecs is not None:
+                T = np.asarray(profile.term_vecs, dtype=np.float32)
+                V = np.asarray(cv_vecs, dtype=np.float32)
+                best = (T @ V.T).max(axis=1)
+                covered = [c or bool(b >= SEMANTIC_THRESHOLD) for c, b in zip(covered, best)]
+        except Exception:
+            pass
+
+    def _flags(items) -> List[bool]:
+        return [covered[profile.term_index[_norm_token(t)]] for t in items]
+
+    return Coverage(
+        required=_flags(profile.required),
+        preferred=_flags(profile.preferred),
+        certs=_flags(profile.mandatory_certs),
+        parsed_required=_flags(profile.parsed_required),
+    )
+
+SIGNAL_SUBSCORES = ("experience_level", "achievement_density", "education", "languages", "continuity")
+
+def _signal_subscores(feats: CVFeatures) -> Tuple[float, float, float, float, float]:
+    """Subscores that depend on the CV alone, in SIGNAL_SUBSCORES order."""
+    # experience level heuristic
+    experience = SENIORITY_SCORES.get(feats.seniority, 0.5)
+    # achievement density: how many bullets have numbers/impact
+    if feats.bullets:
+        achievement = min(1.0, sum(feats.quantified) / max(1, len(feats.bullets)))
     else:
-        subs.achievement_density = 0.3
+        achievement = 0.3
+    # simple education/language presence
+    education = 0.7 if feats.education else 0.4
+    languages = 0.6 if feats.languages else 0.3
+    continuity = 1.0  # placeholder (timeline analysis can be added)
+    return experience, achievement, education, languages, continuity
+
+# -------- Main scoring functions (public API stays compatible) --------
+def compute_subscores(jd: Union[dict, JobProfile], cv_text: str,
+                      features: Optional[CVFeatures] = None, timer=None,
+                      relevance: Optional[float] = None) -> Tuple[Subscores, List[str]]:
+    """
+    jd: a compiled `JobProfile`, or a dict with keys 'title', 'jd_text',
+    'jd_required_skills' (optional), 'jd_preferred_skills' (optional)
+    features: precomputed `CVFeatures` for cv_text (e.g. loaded from the DB)
+    timer: optional `metrics.StageTimer`; time per step is added under "subscores.*"
+    relevance: precomputed JD/CV summary cosine (e.g. from the vector store) for semantic jobs
+    """
+    return _subscores(_as_profile(jd), cv_text, features, timer, relevance=relevance)
+
+def compute_subscores_above(jd: Union[dict, JobProfile], cv_text: str, floor: float,
+                            features: Optional[CVFeatures] = None, timer=None,
+                            relevance: Optional[float] = None) -> Optional[Tuple[Subscores, List[str]]]:
+    """
+    `compute_subscores`, or None as soon as total_score provably stays below
+    `floor`. The first check runs before semantic coverage: with a stored (or
+    given) CV summary vector, role relevance is its exact cosine and only the
+    requirements not hit exactly get full credit. Without one, relevance gets
+    full marks there and is checked again once coverage is known.
+    """
+    profile = _as_profile(jd)
+    feats = features or extract_cv_features(cv_text, embed=False)
+    if (relevance is None and feats.summary_vec is not None and profile.summary_vec is not None
+            and _embeddings_on()):
+        relevance = _cosine(profile.summary_vec, feats.summary_vec)  # one dot product
+    if score_upper_bound(profile, cv_text, feats, relevance) < floor:
+        return None
+    return _subscores(profile, cv_text, feats, timer, floor, relevance=relevance)
 
-    # --- simple education/language presence ---
-    edu_hit = re.search(r"\b(msc|bsc|phd|master|bachelor|degree|licence|licentiate)\b", cv_low)
-    subs.education = 0.7 if edu_hit else 0.4
-    lang_hit = re.search(r"\b(english|french|german|spanish|arabic|portuguese|italian|dutch)\b", cv_low)
-    subs.languages = 0.6 if lang_hit else 0.3
+def compute_subscores_lexical(jd: Union[dict, JobProfile], cv_text: str,
+                              features: Optional[CVFeatures] = None, timer=None) -> Tuple[Subscores, List[str]]:
+    """
+    Cheap first pass of a scoring cascade: exact token coverage, Jaccard role
+    relevance and the regex signals, with no embedding work at all. Equals
+    `compute_subscores` when embeddings are off.
+    """
+    return _subscores(_as_profile(jd), cv_text, features, timer, semantic=False)
+
+def _subscores(profile: JobProfile, cv_text: str, features: Optional[CVFeatures], timer=None,
+               floor: Optional[float] = None, semantic: bool = True,
+               relevance: Optional[float] = None) -> Optional[Tuple[Subscores, List[str]]]:
+    lap = timer.lap("subscores.") if timer is not None else None
+    subs = Subscores()
+    hard_blockers: List[str] = []
 
-    subs.continuity = 1.0  # placeholder (timeline analysis can be added)
+    jd_req = profile.required
+    jd_pref = profile.preferred
+
+    # CV tokens + bullets
+    feats = features or extract_cv_features(cv_text, embed=False)
+    cv_tokens = feats.tokens
+    if lap:
+        lap("features")
+
+    # --- req/pref coverage with semantic fallback ---
+    cov = skill_coverage(profile, cv_tokens, feats.token_vecs, semantic)
+    if jd_req:
+        subs.req_skills = sum(cov.required) / max(1, len(jd_req))
+    if jd_pref:
+        subs.pref_skills = sum(cov.preferred) / max(1, len(jd_pref))
+    if lap:
+        lap("skills")
+
+    # --- CV-only signals (same for every job) ---
+    (subs.experience_level, subs.achievement_density, subs.education,
+     subs.languages, subs.continuity) = _signal_subscores(feats)
 
     # Hard blockers (example: explicit certs in JD)
-    for cert in (jd.get("mandatory_certs") or []):
-        norm = _norm_token(cert)
-        if not _semantic_contains(cv_tokens, norm, embs_cache):
+    for cert, ok in zip(profile.mandatory_certs, cov.certs):
+        if not ok:
             hard_blockers.append(f"Missing mandatory cert: {cert}")
+    if lap:
+        lap("signals")
+
+    # --- role relevance (semantic JD summary vs CV) ---
+    if semantic and profile.summary_vec is not None and _embeddings_on() and relevance is not None:
+        subs.role_relevance = relevance
+    elif semantic and profile.summary_vec is not None and _embeddings_on():
+        if floor is not None:
+            subs.role_relevance = 1.0  # cosine <= 1: best case before paying for the comparison
+            if total_score(subs, hard_blockers) + 1e-9 < floor:
+                return None
+        cv_vec = feats.summary_vec
+        if cv_vec is None:
+            V = _embed([(cv_text or "")[:4000]])
+            cv_vec = V[0] if V is not None else None
+        subs.role_relevance = _cosine(profile.summary_vec, cv_vec)
+    else:
+        # cheap fallback: jaccard over tokens
+        A, B = profile.token_set, set(cv_tokens)
+        subs.role_relevance = len(A & B) / len(A | B) if A and B else 0.0
+    if lap:
+        lap("relevance")
 
     return subs, hard_blockers
 
@@ -302,19 +614,181 @@ def total_score(subs: Subscores, hard_blockers: List[str]) -> float:
     cap = 0.60 if hard_blockers else 1.00
     return min(raw, cap)
 
+def score_upper_bound(jd: Union[dict, JobProfile], cv_text: str, features: Optional[CVFeatures] = None,
+                      relevance: Optional[float] = None) -> float:
+    """
+    Upper bound on total_score(*compute_subscores(jd, cv_text, features)) from
+    the cheap lexical work only: exact token coverage, Jaccard relevance and the
+    regex signals. Whatever the semantic stages could add (requirements not hit
+    exactly, embedding relevance) is counted at full weight, except that a known
+    embedding `relevance` (JD/CV summary cosine) is used as is.
+    """
+    profile = _as_profile(jd)
+    feats = features or extract_cv_features(cv_text, embed=False)
+    cv_set = set(feats.tokens)
+    emb = _embeddings_on()
+    semantic = emb and profile.term_vecs is not None and bool(feats.tokens)
+
+    def share(items) -> float:
+        if not items:
+            return 0.0
+        return 1.0 if semantic else sum(_norm_token(t) in cv_set for t in items) / len(items)
+
+    if profile.summary_vec is not None and emb:
+        relevance = 1.0 if relevance is None else relevance
+    else:
+        A = profile.token_set
+        relevance = len(A & cv_set) / len(A | cv_set) if A and cv_set else 0.0
+    raw = (WEIGHTS["req_skills"] * share(profile.required) + WEIGHTS["pref_skills"] * share(profile.preferred)
+           + WEIGHTS["role_relevance"] * relevance
+           + sum(WEIGHTS[k] * v for k, v in zip(SIGNAL_SUBSCORES, _signal_subscores(feats))))
+    blocked = not semantic and any(_norm_token(c) not in cv_set for c in profile.mandatory_certs)
+    return min(raw, 0.60 if blocked else 1.00) + 1e-9  # margin for float summation order
+
+# -------- Batch scoring: N CVs x M jobs --------
+BATCH_CV_BLOCK = 256  # CVs per token-similarity matmul (bounds the terms x tokens matrix)
+
+@dataclass
+class ScoreMatrix:
+    """Scores of N CVs (rows) against M jobs (columns), as numpy arrays."""
+    total: Any                    # (N, M) total_score of each pair
+    subscores: Dict[str, Any]     # WEIGHTS key -> (N, M)
+    blocked: Any                  # (N, M) bool: a mandatory cert is missing
+    covered: Any                  # (N, len(terms)) bool: requirement term coverage per CV
+    terms: Tuple[str, ...]        # union of the jobs' requirement terms (columns of `covered`)
+    profiles: Tuple[JobProfile, ...]
+
+    def pair(self, i: int, j: int) -> Tuple[Subscores, List[str]]:
+        """(Subscores, hard_blockers) of CV i x job j, as `compute_subscores` returns them."""
+        subs = Subscores(**{k: float(v[i, j]) for k, v in self.subscores.items()})
+        index = {t: u for u, t in enumerate(self.terms)}
+        blockers = [f"Missing mandatory cert: {c}" for c in self.profiles[j].mandatory_certs
+                    if not self.covered[i, index[_norm_token(c)]]]
+        return subs, blockers
+
+def _with_vectors(cv_text: str, feats: Optional[CVFeatures]) -> CVFeatures:
+    """Features with the summary/token embeddings `compute_subscores` would compute on the fly."""
+    if feats is None:
+        return extract_cv_features(cv_text)
+    if not _embeddings_on() or (feats.summary_vec is not None and (feats.token_vecs is not None or not feats.tokens)):
+        return feats
+    V = _embed([(cv_text or "")[:4000], *feats.tokens])
+    if V is None:
+        return feats
+    return replace(feats, summary_vec=V[0], token_vecs=V[1:] if feats.tokens else None)
+
+def score_matrix(jobs: Sequence[Union[dict, JobProfile]], cv_texts: Sequence[str],
+                 features: Optional[Sequence[Optional[CVFeatures]]] = None) -> ScoreMatrix:
+    """
+    Score every CV against every job in one pass; total[i, j] equals
+    total_score(*compute_subscores(jobs[j], cv_texts[i], features[i])).
+    Each CV is tokenized/embedded once; coverage is a CV x term boolean matrix
+    mapped to jobs by count matrices, relevance one normalized matmul, and the
+    total a dot product with the WEIGHTS vector. Jobs must be compiled with the
+    same embedding backend. Job dicts are compiled without filling the profile
+    cache, so sweeping every job does not evict the ones match runs reuse.
+    """
+    import numpy as np  # type: ignore
+    profiles = tuple(_as_profile(j, remember=False) for j in jobs)
+    feats = [_with_vectors(t, features[i] if features else None) for i, t in enumerate(cv_texts)]
+    N, M = len(feats), len(profiles)
+    emb = _embeddings_on()
+
+    # requirement terms of all jobs -> columns; per job, how often each term is required/preferred/a cert
+    terms = tuple(dict.fromkeys(t for p in profiles for t in p.terms))
+    index = {t: u for u, t in enumerate(terms)}
+
+    def counts(items_of) -> Tuple[Any, Any]:
+        C = np.zeros((len(terms), M))
+        for j, p in enumerate(profiles):
+            for t in items_of(p):
+                C[index[_norm_token(t)], j] += 1
+        return C, np.array([len(items_of(p)) for p in profiles], dtype=np.float64)
+
+    # --- coverage: exact token hits, then the best token similarity per term ---
+    covered = np.zeros((N, len(terms)), dtype=bool)
+    for i, f in enumerate(feats):
+        cols = [index[t] for t in f.tokens if t in index]
+        covered[i, cols] = True
+    T = None
+    if emb and terms:
+        T = np.zeros((len(terms), 0), dtype=np.float32)
+        for p in profiles:
+            if p.term_vecs is not None:
+                if T.shape[1] == 0:
+                    T = np.zeros((len(terms), np.asarray(p.term_vecs).shape[1]), dtype=np.float32)
+                T[[index[t] for t in p.terms]] = np.asarray(p.term_vecs, dtype=np.float32)
+        T = T if T.shape[1] else None
+    if T is not None:
+        for start in range(0, N, BATCH_CV_BLOCK):
+            block = [(i, feats[i].token_vecs) for i in range(start, min(N, start + BATCH_CV_BLOCK))
+                     if feats[i].tokens and feats[i].token_vecs is not None]
+            if not block:
+                continue
+            V = np.vstack([np.asarray(v, dtype=np.float32) for _, v in block])
+            offsets = np.cumsum([0] + [len(v) for _, v in block[:-1]])
+            best = np.maximum.reduceat(T @ V.T, offsets, axis=1)   # terms x CVs in block
+            covered[[i for i, _ in block]] |= best.T >= SEMANTIC_THRESHOLD
+
+    hits = covered.astype(np.float64)
+    subs: Dict[str, Any] = {}
+    for name, items_of in (("req_skills", lambda p: p.required), ("pref_skills", lambda p: p.preferred)):
+        C, n = counts(items_of)
+        subs[name] = np.where(n > 0, (hits @ C) / np.maximum(n, 1), 0.0)
+    C, _ = counts(lambda p: p.mandatory_certs)
+    blocked = ((1.0 - hits) @ C) > 0
+
+    # --- role relevance: cosine to the JD summary, or Jaccard over tokens for lexical jobs ---
+    rel = np.zeros((N, M))
+    sem_jobs = [j for j, p in enumerate(profiles) if emb and p.summary_vec is not None]
+    if sem_jobs:
+        S = np.vstack([np.asarray(profiles[j].summary_vec, dtype=np.float32).reshape(-1) for j in sem_jobs])
+        rows = [i for i, f in enumerate(feats) if f.summary_vec is not None]
+        if rows:
+            X = np.vstack([np.asarray(feats[i].summary_vec, dtype=np.float32).reshape(-1) for i in rows])
+            denom = np.outer(np.linalg.norm(X, axis=1), np.linalg.norm(S, axis=1))
+            sims = X @ S.T
+            rel[np.ix_(rows, sem_jobs)] = np.where(denom > 0, sims / np.where(denom > 0, denom, 1), 0.0)
+    lex_jobs = [j for j in range(M) if j not in set(sem_jobs)]
+    if lex_jobs:
+        vocab = {t: k for k, t in enumerate(dict.fromkeys(t for j in lex_jobs for t in profiles[j].token_set))}
+        J = np.zeros((len(lex_jobs), len(vocab)))
+        for r, j in enumerate(lex_jobs):
+            J[r, [vocab[t] for t in profiles[j].token_set]] = 1
+        X = np.zeros((N, len(vocab)))
+        for i, f in enumerate(feats):
+            X[i, [vocab[t] for t in set(f.tokens) if t in vocab]] = 1
+        inter = X @ J.T
+        a = J.sum(axis=1)[None, :]
+        b = np.array([len(set(f.tokens)) for f in feats], dtype=np.float64)[:, None]
+        union = a + b - inter
+        rel[:, lex_jobs] = np.where((a > 0) & (b > 0), inter / np.where(union > 0, union, 1), 0.0)
+    subs["role_relevance"] = rel
+
+    # --- CV-only signals, broadcast over jobs ---
+    signals = np.array([_signal_subscores(f) for f in feats], dtype=np.float64).reshape(N, len(SIGNAL_SUBSCORES))
+    for k, name in enumerate(SIGNAL_SUBSCORES):
+        subs[name] = np.repeat(signals[:, k:k + 1], M, axis=1)
+
+    subs = {k: subs[k] for k in WEIGHTS}
+    weights = np.array(list(WEIGHTS.values()))
+    raw = np.tensordot(weights, np.stack(list(subs.values())), axes=1)
+    total = np.minimum(raw, np.where(blocked, 0.60, 1.00))
+    return ScoreMatrix(total=total, subscores=subs, blocked=blocked, covered=covered, terms=terms, profiles=profiles)
+
 # -------- Rich suggestions (used by match router if available) --------
-def suggest_improvements(jd: dict, cv_text: str, subs: Subscores, hard_blockers: List[str]) -> Dict:
-    jd_text = (jd.get("jd_text") or "")
-    parsed = _jd_requirements(jd_text)
-    req = parsed["required"]
-    pref = parsed["preferred"]
-    cv_tokens = extract_tokens(cv_text or "")
-    embs_cache: Dict[str, any] = {}
-    missing = [r for r in req if not _semantic_contains(cv_tokens, r, embs_cache)]
+def suggest_improvements(jd: Union[dict, JobProfile], cv_text: str, subs: Subscores, hard_blockers: List[str],
+                         features: Optional[CVFeatures] = None) -> Dict:
+    profile = _as_profile(jd)
+    req = profile.parsed_required
+    feats = features or extract_cv_features(cv_text, embed=False)
+    cv_tokens = feats.tokens
+    cov = skill_coverage(profile, cv_tokens, feats.token_vecs)
+    missing = [r for r, ok in zip(req, cov.parsed_required) if not ok]
 
     # bullets to rewrite: up to 3 non-quantified bullets
-    bullets = extract_bullets(cv_text or "")
-    to_fix = [b for b in bullets if not HAS_NUMBER.search(b)][:3]
+    bullets = feats.bullets
+    to_fix = [b for b, q in zip(bullets, feats.quantified) if not q][:3]
     bullets_rw = []
     for b in to_fix:
         # if a missing skill exists, nudge to mention one
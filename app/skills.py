@@ -0,0 +1,79 @@
+# app/skills.py
+"""
+Inverted skill index over candidates (candidate_skill table).
+
+Rows are (candidate_id, canonical) pairs taken from the normalized CV tokens at
+ingestion time; the (canonical, candidate_id) index turns "which candidates
+mention at least K of these skills" into an index scan, so match runs can skip
+CVs that cannot cover a niche JD before any scoring happens.
+"""
+from typing import Dict, Iterable, List, Sequence
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .models import CandidateSkill, Document, DocumentFeatures
+from .scoring import _norm_token
+
+def skill_rows(candidate_id, tokens: Iterable[str]) -> List[Dict]:
+    """candidate_skill rows for normalized CV tokens (one per distinct canonical skill)."""
+    return [
+        {"candidate_id": candidate_id, "canonical": t, "skill_name": t, "confidence": 1.0}
+        for t in dict.fromkeys(tokens)
+    ]
+
+# dialects with INSERT ... ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def _insert_new_skills(db: Session, rows: List[Dict]) -> None:
+    """Insert rows, skipping (candidate_id, canonical) pairs already indexed, also by a concurrent upload."""
+    dialect_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is None:
+        raise NotImplementedError(f"skill index needs ON CONFLICT support ({db.get_bind().dialect.name})")
+    db.execute(dialect_insert(CandidateSkill).on_conflict_do_nothing(
+        index_elements=[CandidateSkill.candidate_id, CandidateSkill.canonical]), rows)
+
+def index_candidate_skills(db: Session, candidate_id, tokens: Iterable[str]) -> None:
+    """Add skills not yet indexed for the candidate (caller commits)."""
+    rows = skill_rows(candidate_id, tokens)
+    if rows:
+        _insert_new_skills(db, rows)
+
+def candidates_covering(skills: Sequence[str], min_count: int):
+    """
+    SELECT of candidate ids that mention at least `min_count` of `skills`
+    (clamped to the number of distinct skills), for use in an IN (...) filter.
+    """
+    canon = list(dict.fromkeys(_norm_token(s) for s in skills if s))
+    k = max(1, min(min_count, len(canon)))
+    return (
+        select(CandidateSkill.candidate_id)
+        .where(CandidateSkill.canonical.in_(canon))
+        .group_by(CandidateSkill.candidate_id)
+        .having(func.count() >= k)
+    )
+
+def backfill_skill_index(db: Session, batch_size: int = 500) -> int:
+    """Index candidates ingested before the skill index existed, from stored features."""
+    indexed = select(CandidateSkill.candidate_id).distinct()
+    stmt = (
+        select(Document.candidate_id, DocumentFeatures.tokens)
+        .join(DocumentFeatures, DocumentFeatures.document_id == Document.id)
+        .where(Document.candidate_id.not_in(indexed))
+        .order_by(Document.candidate_id)
+    )
+    tokens_by_cand: Dict = {}
+    for cand_id, tokens in db.execute(stmt):
+        tokens_by_cand.setdefault(cand_id, []).extend(tokens or [])
+    rows = [r for cand_id, toks in tokens_by_cand.items() for r in skill_rows(cand_id, toks)]
+    for i in range(0, len(rows), batch_size):
+        _insert_new_skills(db, rows[i:i + batch_size])
+    db.commit()
+    return len(tokens_by_cand)
+
+if __name__ == "__main__":
+    # one-off: `python -m app.skills` indexes candidates uploaded before the index existed
+    from .db import SessionLocal
+    with SessionLocal() as db:
+        print(f"indexed {backfill_skill_index(db)} candidate(s)")
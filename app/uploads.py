@@ -0,0 +1,159 @@
+# app/uploads.py
+"""
+Streaming multipart/form-data reader for the upload routes.
+
+FastAPI parses `File(...)` / `Form(...)` parameters with `await request.form()`
+before the route runs, so by then Starlette has received and spooled the whole
+body and any size check comes too late. The upload routes read
+`request.stream()` through `read_multipart` instead: each file part is written
+straight to its own temp file under `spool_dir`, and the request fails with 413
+as soon as the body or a file crosses its cap.
+"""
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Dict, List, Optional
+import os
+import tempfile
+
+from fastapi import HTTPException, Request
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+MAX_FIELD_BYTES = 64 * 1024  # plain form fields (labels, flags)
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # part headers and boundaries around a capped file
+
+def too_large(max_bytes: int, what: str = "File") -> HTTPException:
+    return HTTPException(413, f"{what} too large (max {max_bytes // (1024 * 1024)} MB)")
+
+@dataclass
+class FilePart:
+    """A file field of the form; `path` is its spooled copy (None when it was not kept)."""
+    name: str
+    filename: str
+    path: Optional[str] = None
+    size: int = 0
+    error: Optional[str] = None
+    max_bytes: Optional[int] = None  # overrides read_multipart's max_file for this part
+
+@dataclass
+class MultipartForm:
+    fields: Dict[str, List[str]] = field(default_factory=dict)
+    files: List[FilePart] = field(default_factory=list)
+
+    def get(self, name: str, default: str = "") -> str:
+        values = self.fields.get(name)
+        return values[0] if values else default
+
+    def getlist(self, name: str) -> List[str]:
+        return self.fields.get(name, [])
+
+    def file(self, name: str) -> Optional[FilePart]:
+        return next((f for f in self.files if f.name == name), None)
+
+async def read_multipart(request: Request, spool_dir: str, max_body: int, max_file: int,
+                         suffix_of: Callable[[FilePart], Optional[str]],
+                         on_file: Optional[Callable[[FilePart], None]] = None,
+                         skip_oversized: bool = False) -> MultipartForm:
+    """
+    Read a multipart body chunk by chunk. `suffix_of(part)` names the spool
+    file's suffix, or returns None to skip the part (set `part.error` to say
+    why); it may also set `part.max_bytes`. `on_file(part)` runs when a file part starts and may raise (e.g. too
+    many files). A file over `max_file` answers 413, or with `skip_oversized`
+    gets an error and its remaining bytes are dropped. The caller removes
+    `spool_dir`.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_body:
+        raise too_large(max_body, "Request body")  # rejected from the declared size before reading
+    ctype, params = parse_options_header(request.headers.get("content-type", ""))
+    if ctype != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(400, "Expected a multipart/form-data body")
+
+    form = MultipartForm()
+    header_name, header_value = bytearray(), bytearray()
+    headers: Dict[str, bytes] = {}
+    state = {"part": None, "out": None, "field": None, "value": bytearray()}
+
+    def on_part_begin():
+        headers.clear()
+
+    def on_header_field(data, start, end):
+        header_name.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        headers[header_name.decode("latin-1").lower()] = bytes(header_value)
+        header_name.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        _, opts = parse_options_header(headers.get("content-disposition", b""))
+        name = opts.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" not in opts:
+            state["part"], state["field"] = None, name
+            state["value"] = bytearray()
+            return
+        part = FilePart(name=name, filename=opts[b"filename"].decode("utf-8", "replace"))
+        form.files.append(part)
+        if on_file is not None:
+            on_file(part)
+        state["part"], state["field"] = part, None
+        suffix = suffix_of(part) if part.error is None else None
+        if suffix is not None:
+            fd, part.path = tempfile.mkstemp(prefix="cv-upload-", suffix=suffix, dir=spool_dir)
+            state["out"] = os.fdopen(fd, "wb")
+
+    def on_part_data(data, start, end):
+        part: Optional[FilePart] = state["part"]
+        if part is None:
+            value = state["value"]
+            if len(value) + end - start > MAX_FIELD_BYTES:
+                raise HTTPException(413, "Form field too large")
+            value.extend(data[start:end])
+            return
+        out: Optional[BinaryIO] = state["out"]
+        if out is None:
+            return
+        part.size += end - start
+        limit = part.max_bytes or max_file
+        if part.size > limit:
+            if not skip_oversized:
+                raise too_large(limit)
+            out.close()
+            state["out"] = None
+            os.unlink(part.path)
+            part.path, part.error = None, too_large(limit).detail
+            return
+        out.write(data[start:end])
+
+    def on_part_end():
+        if state["part"] is None:
+            form.fields.setdefault(state["field"], []).append(state["value"].decode("utf-8", "replace"))
+        elif state["out"] is not None:
+            state["out"].close()
+            state["out"] = None
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_body:
+                raise too_large(max_body, "Request body")
+            parser.write(chunk)
+        parser.finalize()
+    except FormParserError:
+        raise HTTPException(400, "Malformed multipart body")
+    finally:
+        if state["out"] is not None:
+            state["out"].close()
+    return form
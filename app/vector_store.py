@@ -0,0 +1,275 @@
+# app/vector_store.py
+"""
+Memory-mapped store of CV summary embeddings.
+
+One directory per embedding backend under VECTOR_STORE_DIR:
+
+  vectors.f16   float16 rows, row-major, appended as CVs are uploaded
+  ids.txt       document id of each row, one fixed-width line per row (row i = line i)
+  meta.json     {"dim": ...}
+
+Writers append under an exclusive file lock; a document uploaded again simply
+gets a newer row (the last row per document wins). Readers take the lock
+shared while they read ids.txt and map vectors.f16, so they never pair the ids
+of one generation with the rows of another; the map itself is read-only and
+every worker process shares the same pages through the OS.
+The match worker compacts the store (drops superseded rows) once at least
+VECTOR_COMPACT_RATIO of its rows are dead, checking every VECTOR_COMPACT_SECONDS;
+`python -m app.vector_store compact` does the same by hand,
+`python -m app.vector_store rebuild` refills the store from document_features.
+"""
+from typing import Collection, Dict, List, Optional, Tuple
+import fcntl
+import json
+import os
+import re
+
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "data/vectors")
+SCAN_BLOCK_ROWS = 16384  # rows converted to float32 at a time during a scan
+ID_WIDTH = 36  # document ids are UUID strings; fixed-width lines give the row count from the file size
+ID_LINE = ID_WIDTH + 1
+VECTOR_COMPACT_RATIO = float(os.getenv("VECTOR_COMPACT_RATIO", "0.25"))  # dead share of rows that triggers compaction
+VECTOR_COMPACT_SECONDS = float(os.getenv("VECTOR_COMPACT_SECONDS", "3600"))  # how often the worker checks
+
+class VectorStore:
+    def __init__(self, root: str, backend: str):
+        self.dir = os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]+", "_", backend))
+        self.vectors_path = os.path.join(self.dir, "vectors.f16")
+        self.ids_path = os.path.join(self.dir, "ids.txt")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.lock_path = os.path.join(self.dir, ".lock")
+
+    # -------- writing --------
+    def _locked(self, mode: int = fcntl.LOCK_EX):
+        os.makedirs(self.dir, exist_ok=True)
+        fh = open(self.lock_path, "a")
+        fcntl.flock(fh, mode)
+        return fh
+
+    def _dim(self) -> Optional[int]:
+        try:
+            with open(self.meta_path) as fh:
+                return int(json.load(fh)["dim"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def append(self, items: List[Tuple[str, object]]) -> None:
+        """Append (document_id, vector) rows."""
+        import numpy as np  # type: ignore
+        if not items:
+            return
+        matrix = np.vstack([np.asarray(v, dtype=np.float32).reshape(-1) for _, v in items]).astype(np.float16)
+        with self._locked():
+            dim = self._dim()
+            if dim is None:
+                dim = matrix.shape[1]
+                with open(self.meta_path, "w") as fh:
+                    json.dump({"dim": dim}, fh)
+            if matrix.shape[1] != dim:
+                raise ValueError(f"vector dim {matrix.shape[1]} != store dim {dim}")
+            self._trim(dim)
+            with open(self.vectors_path, "ab") as fh:
+                fh.write(matrix.tobytes())
+            with open(self.ids_path, "a") as fh:
+                fh.write(_id_lines(doc_id for doc_id, _ in items))
+
+    def _trim(self, dim: int) -> None:
+        """Drop a torn tail left by a writer that died between or inside the two files (lock held)."""
+        rows = min(self._row_count(dim), self._id_count())
+        for path, size in ((self.vectors_path, rows * dim * 2), (self.ids_path, rows * ID_LINE)):
+            try:
+                if os.path.getsize(path) > size:
+                    with open(path, "r+b") as fh:
+                        fh.truncate(size)
+            except OSError:
+                pass
+
+    def _read_ids(self, n: int) -> List[str]:
+        with open(self.ids_path, "rb") as fh:
+            data = fh.read(n * ID_LINE)
+        return [data[i:i + ID_WIDTH].decode("ascii").rstrip() for i in range(0, n * ID_LINE, ID_LINE)]
+
+    def _id_count(self) -> int:
+        try:
+            return os.path.getsize(self.ids_path) // ID_LINE
+        except OSError:
+            return 0
+
+    def _row_count(self, dim: int) -> int:
+        try:
+            return os.path.getsize(self.vectors_path) // (dim * 2)
+        except OSError:
+            return 0
+
+    def rewrite(self, items: Optional[List[Tuple[str, object]]], keep: Optional[Collection[str]] = None) -> int:
+        """Replace the store with `items` (or, when None, its own live rows limited to `keep`)."""
+        import numpy as np  # type: ignore
+        with self._locked():
+            if items is None:
+                view = self._open()
+                rows = view.rows if view is not None else {}
+                if keep is not None:
+                    keep = set(keep)
+                    rows = {d: r for d, r in rows.items() if d in keep}
+                order = sorted(rows.items(), key=lambda kv: kv[1])
+                ids = [d for d, _ in order]
+                matrix = (np.asarray(view.matrix[[r for _, r in order]]) if order
+                          else np.zeros((0, self._dim() or 0), dtype=np.float16))
+            else:
+                ids = [d for d, _ in items]
+                matrix = (np.vstack([np.asarray(v, dtype=np.float32).reshape(-1) for _, v in items]).astype(np.float16)
+                          if items else np.zeros((0, 0), dtype=np.float16))
+                if items:
+                    with open(self.meta_path, "w") as fh:
+                        json.dump({"dim": matrix.shape[1]}, fh)
+            # new files first, then atomic renames; open maps keep reading the old inodes
+            with open(self.vectors_path + ".tmp", "wb") as fh:
+                fh.write(matrix.tobytes())
+            with open(self.ids_path + ".tmp", "w") as fh:
+                fh.write(_id_lines(ids))
+            os.replace(self.vectors_path + ".tmp", self.vectors_path)
+            os.replace(self.ids_path + ".tmp", self.ids_path)
+            return len(ids)
+
+    # -------- reading --------
+    def version(self) -> Tuple[int, ...]:
+        """Cheap change marker (inodes and sizes, so rewrites count) for callers caching an opened view."""
+        marks = []
+        for path in (self.vectors_path, self.ids_path):
+            try:
+                st = os.stat(path)
+                marks.extend((st.st_ino, st.st_size))
+            except OSError:
+                marks.extend((0, 0))
+        return tuple(marks)
+
+    def open(self) -> Optional["StoreView"]:
+        """Read-only view over the rows written so far (None if the store is empty)."""
+        if self._dim() is None:
+            return None
+        with self._locked(fcntl.LOCK_SH):
+            return self._open()
+
+    def dead_rows(self) -> Tuple[int, int]:
+        """(superseded rows, all rows) of the current generation."""
+        view = self.open()
+        if view is None:
+            return 0, 0
+        n = view.matrix.shape[0]
+        return n - len(view.rows), n
+
+    def _open(self) -> Optional["StoreView"]:
+        import numpy as np  # type: ignore
+        dim = self._dim()
+        n = min(self._id_count(), self._row_count(dim)) if dim else 0
+        if n == 0:
+            return None
+        # both files of one generation: rewrite swaps them under the exclusive lock
+        ids = self._read_ids(n)
+        matrix = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(n, dim))
+        rows = {doc_id: i for i, doc_id in enumerate(ids)}  # last row per document wins
+        return StoreView(matrix, rows)
+
+class StoreView:
+    """A mapped (n, dim) float16 matrix plus document id -> live row."""
+
+    def __init__(self, matrix, rows: Dict[str, int]):
+        self.matrix = matrix
+        self.rows = rows
+
+    def dot(self, query_vec, cosine: bool = False):
+        """
+        matrix @ query_vec as float32, converting SCAN_BLOCK_ROWS rows at a time.
+        `cosine` divides by the row and query norms (0 for a zero vector).
+        """
+        import numpy as np  # type: ignore
+        q = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+        out = np.empty(self.matrix.shape[0], dtype=np.float32)
+        qn = float(np.linalg.norm(q))
+        for start in range(0, self.matrix.shape[0], SCAN_BLOCK_ROWS):
+            block = self.matrix[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+            dst = out[start:start + len(block)]
+            np.dot(block, q, out=dst)
+            if cosine:
+                denom = np.linalg.norm(block, axis=1) * qn
+                np.divide(dst, denom, out=dst, where=denom > 0)
+                dst[denom <= 0] = 0.0
+        return out
+
+def get_store(backend: Optional[str]) -> Optional[VectorStore]:
+    return VectorStore(VECTOR_STORE_DIR, backend) if backend else None
+
+def _id_lines(ids) -> str:
+    lines = []
+    for doc_id in ids:
+        doc_id = str(doc_id)
+        if len(doc_id) > ID_WIDTH or not doc_id.isascii():
+            raise ValueError(f"document id {doc_id!r} does not fit the store's {ID_WIDTH}-char id lines")
+        lines.append(doc_id.ljust(ID_WIDTH) + "\n")
+    return "".join(lines)
+
+def remember(items: List[Tuple[object, object]], backend: Optional[str]) -> None:
+    """Append freshly computed (document_id, CV summary vector) pairs in one write (no-op without embeddings)."""
+    store = get_store(backend)
+    items = [(str(doc_id), vec) for doc_id, vec in items if vec is not None]
+    if store is None or not items:
+        return
+    store.append(items)
+
+def rebuild_from_db(db) -> int:
+    """Rewrite the active backend's store from stored document_features."""
+    from sqlalchemy import select, func
+    from .models import Document, DocumentFeatures
+    from .features import _unpack
+    from .scoring import embedding_model_id
+    model = embedding_model_id()
+    store = get_store(model)
+    if store is None:
+        return 0
+    stmt = (
+        select(DocumentFeatures.document_id, DocumentFeatures.summary_vec, DocumentFeatures.dim)
+        .join(Document, Document.id == DocumentFeatures.document_id)
+        .where(func.lower(Document.type) == "cv", DocumentFeatures.embedding_model == model,
+               DocumentFeatures.summary_vec.isnot(None))
+        .execution_options(yield_per=1000)
+    )
+    items = []
+    for doc_id, blob, dim in db.execute(stmt):
+        v = _unpack(blob, dim)
+        if v is not None:
+            items.append((str(doc_id), v[0]))
+    return store.rewrite(items)
+
+def compact(db) -> int:
+    """Drop superseded rows and rows of documents no longer in the DB; returns rows kept."""
+    from sqlalchemy import select
+    from .models import Document
+    from .scoring import embedding_model_id
+    store = get_store(embedding_model_id())
+    if store is None:
+        return 0
+    live = {str(d) for d in db.execute(select(Document.id)).scalars()}
+    return store.rewrite(None, keep=live)
+
+def compact_if_fragmented(db, ratio: float = VECTOR_COMPACT_RATIO) -> Optional[int]:
+    """`compact` once at least `ratio` of the store's rows are superseded; rows kept, or None if not needed."""
+    from .scoring import embedding_model_id
+    store = get_store(embedding_model_id())
+    if store is None:
+        return None
+    dead, n = store.dead_rows()
+    if n == 0 or dead < ratio * n:
+        return None
+    return compact(db)
+
+if __name__ == "__main__":
+    import sys
+    from .db import SessionLocal
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    with SessionLocal() as db:
+        if cmd == "compact":
+            print(f"kept {compact(db)} row(s)")
+        elif cmd == "rebuild":
+            print(f"wrote {rebuild_from_db(db)} row(s)")
+        else:
+            print(__doc__)
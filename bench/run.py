@@ -0,0 +1,329 @@
+# bench/run.py
+"""
+Match pipeline benchmarks.
+
+  python -m bench.run                                   # micro + end-to-end at 100 / 1k / 10k candidates
+  python -m bench.run --sizes 1000 --workers 4
+  python -m bench.run --database-url postgresql+psycopg2://.../cvscore_bench   # e2e through the DB
+  python -m bench.run --cascade-share 0.1 --cascade-threshold 0.5   # lexical -> semantic cascade vs full scoring
+  python -m bench.run --save-baseline                   # store results as bench/baseline.json
+  python -m bench.run --fail-on-regression              # exit 1 if slower than the baseline
+
+Every entry records ops/sec, p50/p95 latency (ms) and the process peak RSS so
+far; results are written as JSON and compared with the stored baseline.
+Baselines are machine-specific and not committed: record one with
+--save-baseline on the runtime you gate on (Python 3.11, as deployed).
+--fail-on-regression exits 2 against a baseline from another Python version,
+machine, CPU count, embedding backend or worker count.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+from .synth import make_corpus
+from .fixtures import make_docx, make_pdf
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _summary(latencies: List[float], total_seconds: Optional[float] = None, n: Optional[int] = None) -> Dict[str, Any]:
+    n = n if n is not None else len(latencies)
+    total = total_seconds if total_seconds is not None else sum(latencies)
+    qs = statistics.quantiles(latencies, n=20, method="inclusive") if len(latencies) > 1 else latencies * 19
+    return {
+        "n": n,
+        "seconds": round(total, 4),
+        "per_sec": round(n / total, 1) if total else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 3) if latencies else None,
+        "p95_ms": round(qs[18] * 1000, 3) if latencies else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+def _timed(fn: Callable, items: Iterable) -> Dict[str, Any]:
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t)
+    return _summary(latencies, time.perf_counter() - start)
+
+def _warm_up(args) -> None:
+    """Load the backend, compile patterns and fault in imports so the first timed entry isn't penalised."""
+    from app.scoring import compile_job, compute_subscores, extract_cv_features, suggest_improvements
+    corpus = make_corpus(20, seed=args.seed - 1, bullets=args.bullets, overlap=args.overlap)
+    profile = compile_job(corpus.jd)
+    for cv in corpus.cvs:
+        feats = extract_cv_features(cv)
+        sub, blockers = compute_subscores(profile, cv, feats)
+        suggest_improvements(profile, cv, sub, blockers, feats)
+
+# -------- micro-benchmarks --------
+def bench_micro(args) -> Dict[str, Any]:
+    from app.scoring import compile_job, compute_subscores, extract_cv_features, scan_cv, suggest_improvements
+    from app.extract import extract_docx, extract_pdf
+
+    corpus = make_corpus(args.micro_n, seed=args.seed, bullets=args.bullets, overlap=args.overlap)
+    out: Dict[str, Any] = {}
+    out["compile_job"] = _timed(lambda jd: compile_job(jd), [dict(corpus.jd, title=f"{corpus.jd['title']} {i}")
+                                                           for i in range(20)])
+    profile = compile_job(corpus.jd)
+    out["scan_cv"] = _timed(scan_cv, corpus.cvs)
+    feats = []  # first pass, so embeddings come from the backend rather than the cache
+    out["extract_cv_features"] = _timed(lambda cv: feats.append(extract_cv_features(cv)), corpus.cvs)
+    pairs = list(zip(corpus.cvs, feats))
+    scored = []
+    out["compute_subscores"] = _timed(lambda p: scored.append(compute_subscores(profile, p[0], p[1])), pairs)
+    out["suggest_improvements"] = _timed(
+        lambda i: suggest_improvements(profile, corpus.cvs[i], scored[i][0], scored[i][1], feats[i]),
+        range(len(pairs)),
+    )
+    docs = corpus.cvs[:args.fixtures]
+    pdfs = [make_pdf(cv) for cv in docs]
+    docxs = [make_docx(cv) for cv in docs]
+    out["extract_pdf"] = _timed(extract_pdf, pdfs)
+    out["extract_docx"] = _timed(extract_docx, docxs)
+    return out
+
+# -------- end-to-end --------
+def bench_e2e_memory(args, size: int) -> Dict[str, Any]:
+    """Ingest features + score + rank + suggestions for the first page, without a DB."""
+    from app.matching import iter_scored_chunks, rank_results
+    from app.scoring import compile_job, extract_cv_features, suggest_improvements, Subscores
+
+    # a seed per size: corpora sharing a prefix would hit the embedding cache
+    corpus = make_corpus(size, seed=args.seed + size, bullets=args.bullets, overlap=args.overlap)
+    out: Dict[str, Any] = {}
+    feats = []
+    out[f"e2e_{size}_ingest"] = _timed(lambda cv: feats.append(extract_cv_features(cv)), corpus.cvs)
+    rows = [(f"{i:08d}", f"cv-{i}", cv, f) for i, (cv, f) in enumerate(zip(corpus.cvs, feats))]
+
+    start = time.perf_counter()
+    profile = compile_job(corpus.jd)
+    results: List[Dict[str, Any]] = []
+    latencies: List[float] = []
+    # serial: one candidate per chunk gives per-candidate latency; pooled: per-chunk average
+    chunk_size = 1 if args.workers == 1 else None
+    t = time.perf_counter()
+    for chunk in iter_scored_chunks(profile, rows, workers=args.workers, chunk_size=chunk_size):
+        now = time.perf_counter()
+        latencies.extend([(now - t) / len(chunk)] * len(chunk))
+        results.extend(chunk)
+        t = now
+    rank_results(results)
+    by_id = {r[0]: r for r in rows}
+    for r in results[:20]:
+        _, _, cv, f = by_id[r["candidate_id"]]
+        suggest_improvements(profile, cv, Subscores(**r["subscores"]), r["hard_blockers"], f)
+    out[f"e2e_{size}_match"] = _summary(latencies, time.perf_counter() - start, n=size)
+    return out
+
+def bench_e2e_db(args, size: int) -> Dict[str, Any]:
+    """Same corpus through the real tables and `execute_run` (rows are removed afterwards)."""
+    from sqlalchemy import delete, insert, select
+    from app.db import Base, SessionLocal, engine
+    from app.features import feature_rows
+    from app.models import Candidate, CandidateSkill, Document, DocumentFeatures, Job, MatchRun, MatchScore
+    from app.runs import execute_run
+    from app.skills import skill_rows
+    import uuid
+
+    Base.metadata.create_all(bind=engine)
+    corpus = make_corpus(size, seed=args.seed + 2 * size, bullets=args.bullets, overlap=args.overlap)
+    out: Dict[str, Any] = {}
+    tag = f"bench-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        job = Job(title=corpus.jd["title"], jd_text=corpus.jd["jd_text"])
+        db.add(job)
+        db.flush()
+        cands = [{"id": uuid.uuid4(), "external_ref": f"{tag}-{i}"} for i in range(size)]
+        docs = [{"id": uuid.uuid4(), "candidate_id": c["id"], "type": "cv", "text_extracted": cv}
+                for c, cv in zip(cands, corpus.cvs)]
+        start = time.perf_counter()
+        feats = feature_rows((d["id"], d["text_extracted"]) for d in docs)
+        for i in range(0, size, 500):
+            db.execute(insert(Candidate), cands[i:i + 500])
+            db.execute(insert(Document), docs[i:i + 500])
+            db.execute(insert(DocumentFeatures), feats[i:i + 500])
+            db.execute(insert(CandidateSkill), [r for d, f in zip(docs[i:i + 500], feats[i:i + 500])
+                                                for r in skill_rows(d["candidate_id"], f["tokens"])])
+        db.commit()
+        out[f"e2e_db_{size}_ingest"] = _summary([], time.perf_counter() - start, n=size)
+
+        run = MatchRun(job_id=job.id, status="running", workers=args.workers, incremental=False)
+        db.add(run)
+        db.commit()
+        start = time.perf_counter()
+        execute_run(run.id)
+        elapsed = time.perf_counter() - start
+        db.refresh(run)
+        out[f"e2e_db_{size}_match"] = _summary([], elapsed, n=run.processed or 0)
+        out[f"e2e_db_{size}_match"]["status"] = run.status
+
+        cand_ids = [c["id"] for c in cands]
+        db.execute(delete(MatchScore).where(MatchScore.run_id == run.id))
+        db.execute(delete(MatchRun).where(MatchRun.job_id == job.id))
+        doc_ids = select(Document.id).where(Document.candidate_id.in_(cand_ids))
+        db.execute(delete(DocumentFeatures).where(DocumentFeatures.document_id.in_(doc_ids)))
+        db.execute(delete(CandidateSkill).where(CandidateSkill.candidate_id.in_(cand_ids)))
+        db.execute(delete(Document).where(Document.candidate_id.in_(cand_ids)))
+        db.execute(delete(Candidate).where(Candidate.id.in_(cand_ids)))
+        db.execute(delete(Job).where(Job.id == job.id))
+        db.commit()
+    return out
+
+# -------- scoring cascade --------
+def rank_agreement(full: List[Dict[str, Any]], other: List[Dict[str, Any]], ks=(10, 50)) -> Dict[str, Any]:
+    """Overlap of the top k ids per k, plus Spearman's rho over the two complete rankings."""
+    a = [r["candidate_id"] for r in full]
+    b = [r["candidate_id"] for r in other]
+    out: Dict[str, Any] = {f"top{k}_overlap": round(len(set(a[:k]) & set(b[:k])) / max(1, min(k, len(a))), 4)
+                           for k in ks}
+    pos = {cid: i for i, cid in enumerate(b)}
+    n = len(a)
+    d2 = sum((i - pos[cid]) ** 2 for i, cid in enumerate(a))
+    out["spearman"] = round(1 - 6 * d2 / (n * (n * n - 1)), 4) if n > 1 else 1.0
+    return out
+
+def bench_cascade(args, size: int) -> Dict[str, Any]:
+    """All-semantic `score_candidates` vs the lexical -> semantic `score_cascade` on CVs without stored features."""
+    from app.matching import score_cascade, score_candidates
+    from app.scoring import compile_job
+
+    corpus = make_corpus(size, seed=args.seed + 3 * size, bullets=args.bullets, overlap=args.overlap)
+    profile = compile_job(corpus.jd)
+    if not profile.semantic:
+        return {}  # without embeddings both passes are the same lexical scoring
+    rows = [(f"{i:08d}", None, cv, None) for i, cv in enumerate(corpus.cvs)]
+    score_candidates(profile, rows, args.workers)  # fill the embedding cache so neither side pays for misses
+    out: Dict[str, Any] = {}
+    start = time.perf_counter()
+    full = score_candidates(profile, rows, args.workers)
+    out[f"cascade_{size}_full"] = _summary([], time.perf_counter() - start, n=size)
+    start = time.perf_counter()
+    cascade = score_cascade(profile, rows, args.cascade_threshold, args.cascade_share, args.workers)
+    out[f"cascade_{size}_cascade"] = _summary([], time.perf_counter() - start, n=size)
+    out[f"cascade_{size}_agreement"] = {
+        "threshold": args.cascade_threshold,
+        "share": args.cascade_share,
+        "semantic": sum(r["stage"] == "semantic" for r in cascade),
+        **rank_agreement(full, cascade),
+    }
+    return out
+
+# -------- baseline --------
+COMPARABLE_META = ("python", "machine", "cpus", "embeddings", "workers")
+
+def _meta_key(meta: Dict[str, Any], key: str) -> Any:
+    value = meta.get(key)
+    if key == "python" and value:
+        return ".".join(str(value).split(".")[:2])  # patch releases are comparable
+    return value
+
+def mismatched_meta(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Meta keys on which the baseline was recorded differently, so timings are not comparable."""
+    base = baseline.get("meta", {})
+    return [k for k in COMPARABLE_META if _meta_key(base, k) != _meta_key(current["meta"], k)]
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print a per-entry comparison; returns the names slower than baseline by more than `tolerance`."""
+    slower = []
+    for key in mismatched_meta(current, baseline):
+        print(f"note: baseline {key}={baseline.get('meta', {}).get(key)!r}, current {current['meta'].get(key)!r}")
+    print(f"{'benchmark':34s} {'baseline/s':>12s} {'current/s':>12s} {'change':>8s}")
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("per_sec") or not cur.get("per_sec"):
+            continue
+        change = cur["per_sec"] / base["per_sec"] - 1
+        flag = "  REGRESSION" if change < -tolerance else ""
+        print(f"{name:34s} {base['per_sec']:12.1f} {cur['per_sec']:12.1f} {change:+8.1%}{flag}")
+        if flag:
+            slower.append(name)
+    return slower
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="100,1000,10000", help="end-to-end candidate counts")
+    ap.add_argument("--micro-n", type=int, default=300, help="CVs per micro-benchmark")
+    ap.add_argument("--fixtures", type=int, default=30, help="generated PDF/DOCX files per format")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--bullets", type=int, default=12, help="mean bullets per CV")
+    ap.add_argument("--overlap", type=float, default=0.5, help="share of JD skills a CV mentions")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--database-url", help="also run end-to-end through this (Postgres) DB")
+    ap.add_argument("--cascade-sizes", default="1000", help="candidate counts for the cascade comparison ('' to skip)")
+    ap.add_argument("--cascade-threshold", type=float, help="lexical score that sends a CV to the semantic pass")
+    ap.add_argument("--cascade-share", type=float, default=0.2, help="best share by lexical score rescored semantically")
+    ap.add_argument("--skip-micro", action="store_true")
+    ap.add_argument("--out", default="bench_output.json")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before flagging")
+    ap.add_argument("--fail-on-regression", action="store_true")
+    args = ap.parse_args(argv)
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url  # before app.db is imported
+        os.environ.setdefault("VECTOR_STORE_DIR", tempfile.mkdtemp(prefix="bench-vectors-"))
+    from app.embeddings import backend_stats, get_backend
+    backend = get_backend()
+
+    _warm_up(args)
+    results: Dict[str, Any] = {}
+    if not args.skip_micro:
+        results.update(bench_micro(args))
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        results.update(bench_e2e_memory(args, size))
+        if args.database_url:
+            results.update(bench_e2e_db(args, size))
+    for size in [int(s) for s in args.cascade_sizes.split(",") if s.strip()]:
+        results.update(bench_cascade(args, size))
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "embeddings": backend.name if backend is not None else None,
+            "seed": args.seed,
+            "workers": args.workers,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+        "embedding_stats": backend_stats(),
+    }
+    with open(args.out, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"wrote {args.out}")
+
+    slower: List[str] = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        slower = compare(report, baseline, args.tolerance)
+        mismatched = mismatched_meta(report, baseline)
+        if args.fail_on_regression and mismatched:
+            print(f"baseline not comparable ({', '.join(mismatched)} differ); "
+                  f"re-record it with --save-baseline on this runtime")
+            return 2
+    elif args.fail_on_regression and not args.save_baseline:
+        print(f"no baseline at {args.baseline}; record one with --save-baseline")
+        return 2
+    if args.save_baseline:
+        with open(args.baseline, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"saved baseline {args.baseline}")
+    return 1 if slower and args.fail_on_regression else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# bench/synth.py
+"""
+Deterministic synthetic JD / CV corpora. Same seed + parameters -> same text,
+so benchmark numbers are comparable across commits and machines.
+"""
+from dataclasses import dataclass
+from typing import Dict, List
+import random
+
+SKILLS = [
+    "python", "sql", "airflow", "spark", "kubernetes", "docker", "terraform", "aws", "azure", "gcp",
+    "postgresql", "kafka", "dbt", "snowflake", "java", "scala", "go", "rust", "typescript", "react",
+    "node.js", "django", "fastapi", "flask", "pandas", "numpy", "pytorch", "tensorflow", "power bi",
+    "tableau", "excel", "microsoft 365", "linux", "git", "ci-cd", "graphql", "redis", "mongodb",
+    "elasticsearch", "prometheus", "grafana", "ansible", "jenkins", "c++", "c#", ".net", "php", "ruby",
+]
+VERBS = ["Built", "Led", "Designed", "Migrated", "Automated", "Reduced", "Improved", "Owned", "Scaled", "Shipped"]
+OBJECTS = ["the data platform", "a billing service", "ETL pipelines", "the CI pipeline", "reporting dashboards",
+           "an internal API", "the search backend", "ML training jobs", "the on-call rota", "a customer portal"]
+OUTCOMES = ["cutting costs by {n}%", "for {n}k daily users", "reducing latency by {n}%", "saving {n} hours a week",
+            "with {n} engineers", "across {n} teams"]
+TITLES = ["Data Engineer", "Backend Engineer", "Platform Engineer", "ML Engineer", "BI Developer", "SRE"]
+LEVELS = ["Junior", "Mid-level", "Senior", "Lead", "Staff"]
+DEGREES = ["BSc Computer Science", "MSc Data Science", "Bachelor of Engineering", "PhD Physics", ""]
+LANGUAGES = ["English", "French", "German", "Spanish", "Dutch", ""]
+
+@dataclass
+class Corpus:
+    jd: Dict
+    cvs: List[str]
+
+def make_jd(rng: random.Random, n_required: int = 8, n_preferred: int = 4) -> Dict:
+    skills = rng.sample(SKILLS, n_required + n_preferred)
+    req, pref = skills[:n_required], skills[n_required:]
+    title = f"{rng.choice(LEVELS)} {rng.choice(TITLES)}"
+    text = "\n".join([
+        f"We are hiring a {title} to join our platform team.",
+        "Responsibilities:",
+        *(f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)} using {s}" for s in req[:4]),
+        "Requirements:",
+        *(f"- {rng.randint(2, 6)}+ years with {s}" for s in req),
+        "Nice to have:",
+        *(f"- {s}" for s in pref),
+    ])
+    return {"title": title, "jd_text": text, "jd_required_skills": [], "jd_preferred_skills": []}
+
+def _bullet(rng: random.Random, skill: str, quantified: bool) -> str:
+    line = f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} with {skill}"
+    if quantified:
+        line += ", " + rng.choice(OUTCOMES).format(n=rng.randint(2, 90))
+    return line
+
+def make_cv(rng: random.Random, jd_skills: List[str], bullets: int = 12, overlap: float = 0.5) -> str:
+    """`overlap`: expected share of JD skills the CV mentions."""
+    own = [s for s in jd_skills if rng.random() < overlap]
+    others = rng.sample([s for s in SKILLS if s not in jd_skills], k=min(6, len(SKILLS) - len(jd_skills)))
+    pool = own + others or ["excel"]
+    lines = [
+        f"Candidate {rng.randint(1000, 9999)}",
+        f"{rng.choice(LEVELS)} {rng.choice(TITLES)}",
+        "",
+        "Summary:",
+        f"Engineer with {rng.randint(1, 15)} years of experience in {', '.join(pool[:5])}.",
+        "",
+        "Experience:",
+    ]
+    for i in range(bullets):
+        lines.append(rng.choice(["- ", "* ", "• "]) + _bullet(rng, pool[i % len(pool)], rng.random() < 0.5))
+        if rng.random() < 0.2:
+            lines.append("  continued work on reliability and documentation")
+    lines += ["", "Skills:", ", ".join(pool), "", "Education:", rng.choice(DEGREES),
+              "Languages:", rng.choice(LANGUAGES)]
+    return "\n".join(lines)
+
+def make_corpus(n_cvs: int, seed: int = 42, bullets: int = 12, overlap: float = 0.5,
+                n_required: int = 8, n_preferred: int = 4) -> Corpus:
+    rng = random.Random(seed)
+    jd = make_jd(rng, n_required, n_preferred)
+    jd_skills = [ln.split(" with ", 1)[1] for ln in jd["jd_text"].splitlines() if " years with " in ln]
+    cvs = [make_cv(rng, jd_skills, max(1, int(rng.gauss(bullets, bullets / 4))), overlap) for _ in range(n_cvs)]
+    return Corpus(jd=jd, cvs=cvs)